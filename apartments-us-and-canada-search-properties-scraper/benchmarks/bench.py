@@ -0,0 +1,287 @@
+"""
+Offline benchmark suite.
+
+    python benchmarks/bench.py                   # run everything, compare to baseline.json
+    python benchmarks/bench.py --save-baseline   # record the current numbers as the baseline
+    python benchmarks/bench.py --only micro      # skip the end-to-end crawl
+
+End-to-end: starts mock_server.py in its own process and runs src/runner.py
+(the real runner.main, in a subprocess) against it through the proxy setting,
+from a single search URL whose pager covers --listings listings.
+It reports pages/sec, ms/page and the runner's peak RSS. Micro: times
+parse_listing_page (full, and with price-only and JSON-LD-only `fields` projections),
+parse_amenities and parse_media over the corpus, and each record writer (the
+pyarrow-backed ones in a subprocess, so pyarrow stays out of micro.peak_rss_mb).
+
+A run regresses when a metric is worse than the baseline by more than
+--tolerance. With --fail-on-regression the exit status is then 1.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+from bs4 import BeautifulSoup
+
+BENCH_DIR = Path(__file__).resolve().parent
+PROJECT_DIR = BENCH_DIR.parent
+SRC_DIR = PROJECT_DIR / "src"
+sys.path.insert(0, str(SRC_DIR))
+sys.path.insert(0, str(BENCH_DIR))
+
+from extractors.amenities_parser import parse_amenities  # noqa: E402
+from extractors.listing_parser import parse_listing_page, resolve_fields  # noqa: E402
+from extractors.media_parser import parse_media  # noqa: E402
+from extractors.record import as_dict  # noqa: E402
+from mock_server import CORPUS_DIR, listing_url, run_server  # noqa: E402
+from outputs.exporters import WRITERS, ColumnarWriter  # noqa: E402
+
+BASELINE_PATH = BENCH_DIR / "baseline.json"
+# A price-monitoring style projection, to track the `fields` fast path
+PRICE_FIELDS = resolve_fields(["monthlyRent", "bedrooms", "bathrooms", "location"])
+# Covered by JSON-LD alone, to track the no-DOM path
+JSON_LD_FIELDS = resolve_fields(["fullAddress", "listingCity", "listingState", "location", "propertyType"])
+
+# Features the e2e crawl always runs with, whatever the example settings say,
+# so its numbers stay comparable with the baseline
+E2E_SETTINGS: Dict[str, Dict[str, Any]] = {
+    "crawler": {"pipeline": True, "parse_workers": 4, "paginate": True},
+    "journal": {"enabled": True},
+    "rate_limit": {"enabled": True},
+    "stream": {"enabled": True},
+}
+
+# Metrics where a larger number is better; everything else is a cost
+HIGHER_IS_BETTER = {"e2e.pages_per_sec"}
+
+def _peak_rss_mb(who: int) -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(who).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+def _time_per_call(fn: Callable[[], Any], min_secs: float) -> float:
+    """Mean ms per call, repeating until at least `min_secs` have elapsed."""
+    fn()  # warm-up
+    calls = 0
+    started = time.perf_counter()
+    while True:
+        fn()
+        calls += 1
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_secs:
+            return elapsed * 1000 / calls
+
+def _time_export(writer_cls: type, fmt: str, batch: List[Dict[str, Any]], min_secs: float) -> float:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, f"out.{fmt}")
+
+        def write_all() -> None:
+            with writer_cls(path) as writer:
+                for rec in batch:
+                    writer.write(rec)
+
+        return _time_per_call(write_all, min_secs)
+
+def run_micro(min_secs: float) -> Dict[str, float]:
+    results: Dict[str, float] = {}
+    pages = [(p.stem, p.read_text(encoding="utf-8")) for p in sorted((CORPUS_DIR / "listing").glob("*.html"))]
+    records: List[Dict[str, Any]] = []
+    totals = {
+        "parse_listing_page": 0.0,
+        "parse_listing_page_price_fields": 0.0,
+        "parse_listing_page_json_ld_fields": 0.0,
+        "parse_amenities": 0.0,
+        "parse_media": 0.0,
+    }
+    for i, (name, html) in enumerate(pages):
+        url = listing_url(i)
+        soup = BeautifulSoup(html, "lxml")
+        timings = {
+            "parse_listing_page": _time_per_call(lambda: parse_listing_page(url, html), min_secs),
+            "parse_listing_page_price_fields": _time_per_call(lambda: parse_listing_page(url, html, PRICE_FIELDS), min_secs),
+            "parse_listing_page_json_ld_fields": _time_per_call(lambda: parse_listing_page(url, html, JSON_LD_FIELDS), min_secs),
+            "parse_amenities": _time_per_call(lambda: parse_amenities(soup), min_secs),
+            "parse_media": _time_per_call(lambda: parse_media(soup), min_secs),
+        }
+        for fn_name, ms in timings.items():
+            results[f"micro.{fn_name}.{name}_ms"] = ms
+            totals[fn_name] += ms
+        records.append(as_dict(parse_listing_page(url, html)))
+    for fn_name, total in totals.items():
+        results[f"micro.{fn_name}.mean_ms"] = total / len(pages)
+
+    # exporters: ms per 1000 records written
+    batch = [dict(records[i % len(records)], listingId=f"b{i:05d}") for i in range(1000)]
+    for fmt, writer_cls in WRITERS.items():
+        try:
+            if writer_cls is ColumnarWriter:
+                # Importing pyarrow alone adds ~100 MB; keep it out of micro.peak_rss_mb
+                with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                    ms = pool.submit(_time_export, writer_cls, fmt, batch, min_secs).result()
+            else:
+                ms = _time_export(writer_cls, fmt, batch, min_secs)
+        except RuntimeError as e:
+            # parquet/arrow without pyarrow installed
+            print(f"skipping {fmt} export: {e}")
+            continue
+        results[f"micro.export.{fmt}_ms_per_1k"] = ms
+    results["micro.peak_rss_mb"] = _peak_rss_mb(resource.RUSAGE_SELF)
+    return results
+
+def run_e2e(listings: int, per_page: int, latency_ms: float, jitter_ms: float, error_rate: float, port: int,
+            settings_overrides: Dict[str, Any]) -> Dict[str, float]:
+    ready = multiprocessing.Event()
+    server = multiprocessing.Process(
+        target=run_server,
+        args=("127.0.0.1", port, per_page, latency_ms, jitter_ms, error_rate, ready, listings),
+        daemon=True,
+    )
+    server.start()
+    try:
+        if not ready.wait(10):
+            raise RuntimeError("mock server did not start")
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp_dir = Path(tmp)
+            # The runner follows the mock pager to the remaining search pages
+            inputs = {"searchUrls": ["http://www.apartments.com/apartments/springfield-il/"]}
+            settings = json.loads((SRC_DIR / "config" / "settings.example.json").read_text(encoding="utf-8"))
+            for section, values in E2E_SETTINGS.items():
+                settings.setdefault(section, {}).update(values)
+            settings["cache"]["enabled"] = False
+            settings["incremental"]["enabled"] = False
+            settings["journal"]["path"] = str(tmp_dir / "journal.sqlite")
+            settings.setdefault("frontier", {})["path"] = str(tmp_dir / "frontier.sqlite")
+            settings.setdefault("metrics", {})["stats_file"] = str(tmp_dir / "stats.json")
+            for section, values in settings_overrides.items():
+                if isinstance(values, dict):
+                    settings.setdefault(section, {}).update(values)
+                else:
+                    settings[section] = values
+            (tmp_dir / "inputs.json").write_text(json.dumps(inputs), encoding="utf-8")
+            (tmp_dir / "settings.json").write_text(json.dumps(settings), encoding="utf-8")
+            (tmp_dir / "proxies.json").write_text(json.dumps({"http": f"http://127.0.0.1:{port}", "https": None}), encoding="utf-8")
+            out = tmp_dir / "out.ndjson"
+            cmd = [
+                sys.executable, str(SRC_DIR / "runner.py"),
+                "--inputs", str(tmp_dir / "inputs.json"),
+                "--settings", str(tmp_dir / "settings.json"),
+                "--proxies", str(tmp_dir / "proxies.json"),
+                "--out", str(out),
+            ]
+            env = {k: v for k, v in os.environ.items() if k != "OUTPUT_PATH"}
+            started = time.perf_counter()
+            proc = subprocess.run(cmd, cwd=str(PROJECT_DIR), env=env, capture_output=True, text=True)
+            wall = time.perf_counter() - started
+            if proc.returncode != 0:
+                raise RuntimeError(f"runner failed:\n{proc.stderr}")
+            with open(out, encoding="utf-8") as f:
+                records = [json.loads(line) for line in f if line.strip()]
+            stats = json.loads((tmp_dir / "stats.json").read_text(encoding="utf-8"))
+    finally:
+        server.terminate()
+        server.join()
+
+    pages = stats["counters"].get('pages_fetched_total{kind="detail"}', 0)
+    failed = sum(1 for r in records if r.get("_error"))
+    results = {
+        "e2e.records": len(records),
+        "e2e.failed_records": failed,
+        "e2e.wall_secs": wall,
+        "e2e.pages_per_sec": len(records) / wall,
+        "e2e.ms_per_page": wall * 1000 / max(1, len(records)),
+        "e2e.detail_fetches": pages,
+        "e2e.peak_rss_mb": _peak_rss_mb(resource.RUSAGE_CHILDREN),
+    }
+    parse = stats["histograms"].get('parse_seconds{parser="parse_listing_page"}')
+    if parse:
+        results["e2e.parse_mean_ms"] = parse["mean_ms"]
+    return results
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> List[str]:
+    regressions = []
+    print(f"\n{'metric':<48} {'current':>12} {'baseline':>12} {'change':>9}")
+    for name, value in results.items():
+        base = baseline.get(name)
+        if base in (None, 0):
+            print(f"{name:<48} {value:>12.3f} {'-':>12} {'':>9}")
+            continue
+        change = (value - base) / base
+        worse = -change if name in HIGHER_IS_BETTER else change
+        # counts and wall time are context, not pass/fail metrics
+        gated = name.endswith(("_ms", "_ms_per_1k", "_mb", "pages_per_sec", "ms_per_page"))
+        flag = ""
+        if gated and worse > tolerance:
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:<48} {value:>12.3f} {base:>12.3f} {change:>+8.1%}{flag}")
+    return regressions
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline throughput benchmarks")
+    parser.add_argument("--only", choices=["e2e", "micro"], help="Run just one part of the suite.")
+    parser.add_argument("--listings", type=int, default=400, help="Listings in the end-to-end crawl.")
+    parser.add_argument("--per-page", type=int, default=40, help="Listings per search page.")
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--set",
+        action="append",
+        default=[],
+        metavar="[SECTION.]KEY=JSON",
+        help="Override a runner setting for the e2e run, e.g. crawler.parse_workers=0 or fields='[\"monthlyRent\"]' (repeatable).",
+    )
+    parser.add_argument("--min-secs", type=float, default=0.5, help="Minimum timing window per microbenchmark.")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH))
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed slowdown before flagging (0.15 = 15%%).")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    parser.add_argument("--json", help="Also write the results to this file.")
+    args = parser.parse_args()
+
+    overrides: Dict[str, Any] = {}
+    for item in args.set:
+        key, _, raw = item.partition("=")
+        section, _, name = key.partition(".")
+        if name:
+            overrides.setdefault(section, {})[name] = json.loads(raw)
+        else:
+            overrides[section] = json.loads(raw)
+
+    results: Dict[str, float] = {}
+    if args.only != "micro":
+        results.update(
+            run_e2e(args.listings, args.per_page, args.latency_ms, args.jitter_ms, args.error_rate, args.port, overrides)
+        )
+    if args.only != "e2e":
+        results.update(run_micro(args.min_secs))
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        payload = {
+            "machine": f"{platform.python_implementation()} {platform.python_version()} on {platform.machine()}",
+            "results": {k: round(v, 3) for k, v in results.items()},
+        }
+        baseline_path.write_text(json.dumps(payload, indent=2) + "\n", encoding="utf-8")
+        print(f"Saved baseline to {baseline_path}")
+    baseline = json.loads(baseline_path.read_text(encoding="utf-8"))["results"] if baseline_path.exists() else {}
+    regressions = compare(results, baseline, args.tolerance)
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2), encoding="utf-8")
+    if regressions:
+        print(f"\n{len(regressions)} metric(s) regressed by more than {args.tolerance:.0%}")
+        if args.fail_on_regression:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
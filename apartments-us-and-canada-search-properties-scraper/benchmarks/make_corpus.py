@@ -0,0 +1,95 @@
+"""
+Regenerates the synthetic benchmark corpus in benchmarks/corpus/.
+
+The pages mimic the structure the extractors look at on apartments.com (JSON-LD,
+price/bed summary, tel: link, grouped amenities, image gallery, rentals table)
+wrapped in the kind of nav/script/footer weight real pages carry. Output is
+seeded, so regenerating gives byte-identical files. Real pages saved from the
+site can be dropped into corpus/listing/ or corpus/search/ next to these.
+"""
+import json
+import random
+from pathlib import Path
+
+CORPUS_DIR = Path(__file__).with_name("corpus")
+
+CITIES = [("Winston-Salem", "NC", "27105"), ("Austin", "TX", "78701"), ("Denver", "CO", "80202"), ("Toronto", "ON", "M5V 2T6")]
+AMENITY_WORDS = ["Washer/Dryer", "Air Conditioning", "Dishwasher", "Patio", "Balcony", "Walk-In Closets", "Pool",
+                 "Fitness Center", "Clubhouse", "Dog Park", "Package Service", "EV Charging", "Gated", "Storage Units",
+                 "Hardwood Floors", "Stainless Steel Appliances", "Ceiling Fans", "Fireplace", "Business Center", "Playground"]
+AMENITY_GROUPS = ["Apartment Features", "Community Amenities", "Kitchen", "Outdoor Space", "Services", "Security"]
+LOREM = ("Bright, renovated homes close to downtown with easy access to transit, parks and dining. "
+         "Residents enjoy on-site management, flexible lease terms and a pet-friendly community. ").split()
+
+def _boilerplate(rng: random.Random, links: int, scripts: int) -> str:
+    nav = "".join(f'<li><a href="/{rng.choice(LOREM).lower()}-{i}/">Browse {i}</a></li>' for i in range(links))
+    js = "".join(
+        f'<script>window.__cfg{i}={json.dumps({"k": [rng.random() for _ in range(120)]})};</script>' for i in range(scripts)
+    )
+    return f'<nav><ul class="mainNav">{nav}</ul></nav>{js}'
+
+def _listing_page(rng: random.Random, idx: int, amenity_groups: int, images: int, rentals: int, filler: int) -> str:
+    city, state, zip_code = CITIES[idx % len(CITIES)]
+    name = f"{100 + idx * 7} {rng.choice(['Oak', 'Maple', 'Pine', 'Cedar'])} St"
+    lo = rng.randrange(900, 2000, 25)
+    ld = {
+        "@context": "https://schema.org",
+        "@type": "Apartment",
+        "name": name,
+        "address": {"@type": "PostalAddress", "streetAddress": name, "addressLocality": city,
+                    "addressRegion": state, "postalCode": zip_code, "addressCountry": "CA" if state == "ON" else "US"},
+        "geo": {"@type": "GeoCoordinates", "latitude": round(rng.uniform(30, 45), 5), "longitude": round(rng.uniform(-120, -75), 5)},
+    }
+    groups = []
+    for g in range(amenity_groups):
+        items = "".join(f"<li>{w}</li>" for w in rng.sample(AMENITY_WORDS, rng.randint(4, 12)))
+        groups.append(f'<div class="amenityGroup"><h3>{AMENITY_GROUPS[g % len(AMENITY_GROUPS)]}</h3><ul>{items}</ul></div>')
+    gallery = "".join(
+        f'<img data-src="https://images1.apartments.com/i2/{idx}-{i}.jpg" alt="Photo {i}" width="640" height="480">'
+        for i in range(images)
+    )
+    rows = "".join(
+        f"<tr><td>{b} beds</td><td>{max(1, b - rng.randint(0, 1))} baths</td><td>${lo + b * 150:,}</td>"
+        f"<td>{600 + b * 250:,} sq ft</td><td>Unit {idx}{r:02d}</td></tr>"
+        for r in range(rentals)
+        for b in [rng.randint(1, 4)]
+    )
+    text = " ".join(" ".join(LOREM) for _ in range(filler))
+    return (
+        f'<!DOCTYPE html><html><head><title>{name} - {city}, {state}</title>'
+        f'<meta property="og:title" content="{name}">'
+        f'<script type="application/ld+json">{json.dumps(ld)}</script></head><body>'
+        f"{_boilerplate(rng, 80 + filler * 4, 4 + filler // 2)}"
+        f'<h1 class="propertyName">{name}</h1>'
+        f'<div class="priceBedRangeInfo"><p>${lo:,} - ${lo + 600:,} /mo</p><p>1 - 4 Beds</p><p>1 - 3 Baths</p><p>{650:,} sq ft</p></div>'
+        f'<a href="tel:{rng.randint(200, 999)}-555-{rng.randint(1000, 9999)}">Call</a>'
+        f'<section id="descriptionSection"><p>{text}</p></section>'
+        f'<section id="amenitiesSection"><h2>Amenities</h2>{"".join(groups)}</section>'
+        f'<section class="gallery">{gallery}</section>'
+        f"<table><tr><th>Beds</th><th>Baths</th><th>Rent</th><th>Sq Ft</th><th>Unit</th></tr>{rows}</table>"
+        f"<p>Take a 3D tour</p><footer>{_boilerplate(rng, 40, 2)}</footer></body></html>"
+    )
+
+def _search_page(rng: random.Random) -> str:
+    # Listing cards and the pager are filled in by the mock server ({links}, {paging} placeholders)
+    return (
+        "<!DOCTYPE html><html><head><title>Apartments for Rent</title></head><body>"
+        f'{_boilerplate(rng, 120, 6)}<div id="placardContainer"><ul>{{links}}</ul></div>'
+        '<nav id="paging" class="paging">{paging}</nav>'
+        "</body></html>"
+    )
+
+# (amenity groups, images, rental rows, filler paragraphs): small to very large pages
+LISTING_SHAPES = [(2, 8, 3, 4), (4, 24, 8, 12), (6, 60, 20, 30), (6, 120, 60, 70)]
+
+def main() -> None:
+    rng = random.Random(1234)
+    (CORPUS_DIR / "listing").mkdir(parents=True, exist_ok=True)
+    (CORPUS_DIR / "search").mkdir(parents=True, exist_ok=True)
+    for i, shape in enumerate(LISTING_SHAPES):
+        html = _listing_page(rng, i, *shape)
+        (CORPUS_DIR / "listing" / f"listing-{i}.html").write_text(html, encoding="utf-8")
+    (CORPUS_DIR / "search" / "search-0.html").write_text(_search_page(rng), encoding="utf-8")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Local stand-in for apartments.com that serves the benchmark corpus.
+
+It speaks enough HTTP/1.1 (keep-alive, absolute-form request targets) to be used
+as the crawler's `http` proxy, so runs need no code changes: point proxies.json
+at it and use http:// input URLs.
+
+- Search pages live under /apartments/<place>/<page>/. Each page links to
+  `--per-page` listings, and page p holds listings (p-1)*per_page onward.
+  The pager ("Page p of N" plus page links) covers `--listings` listings.
+- Every other path is a listing page, picked from corpus/listing/ by the
+  listing id.
+- Each response waits `latency_ms` plus up to `jitter_ms`. An `error_rate`
+  share of responses is a 503 instead.
+"""
+import argparse
+import asyncio
+import math
+import random
+import re
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+CORPUS_DIR = Path(__file__).with_name("corpus")
+SEARCH_PATH_RE = re.compile(r"/apartments/[^/]+/(?:(\d+)/)?$")
+LISTING_ID_RE = re.compile(r"/b(\d+)/?$")
+
+def listing_url(i: int) -> str:
+    return f"http://www.apartments.com/bench-{i}-springfield-il/b{i:05d}/"
+
+class MockSite:
+    def __init__(self, per_page: int = 40, latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0, seed: int = 0,
+                 listings: int = 400):
+        self.per_page = per_page
+        self.listing_total = listings
+        self.pages = max(1, math.ceil(listings / per_page))
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.listings: List[bytes] = [p.read_bytes() for p in sorted((CORPUS_DIR / "listing").glob("*.html"))]
+        self.search_template = sorted((CORPUS_DIR / "search").glob("*.html"))[0].read_text(encoding="utf-8")
+        self.requests = 0
+        self.errors = 0
+
+    def render(self, path: str) -> Tuple[int, bytes]:
+        m = SEARCH_PATH_RE.search(path)
+        if m:
+            page = int(m.group(1) or 1)
+            start = (page - 1) * self.per_page
+            cards = "".join(
+                f'<li><article class="placard"><a class="property-link" href="{listing_url(i)}">Listing {i}</a></article></li>'
+                for i in range(start, min(start + self.per_page, self.listing_total))
+            )
+            paging = f'<span class="pageRange">Page {page} of {self.pages}</span>' + "".join(
+                f'<a data-page="{p}" href="../{p}/">{p}</a>' for p in range(1, self.pages + 1)
+            )
+            html = self.search_template.replace("{links}", cards).replace("{paging}", paging)
+            return 200, html.encode("utf-8")
+        m = LISTING_ID_RE.search(path)
+        index = int(m.group(1)) if m else 0
+        return 200, self.listings[index % len(self.listings)]
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    return
+                keep_alive = True
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    if line.lower().startswith(b"connection:") and b"close" in line.lower():
+                        keep_alive = False
+                target = request_line.split(b" ")[1].decode("latin-1")
+                # proxy requests carry the absolute URL
+                path = re.sub(r"^https?://[^/]+", "", target) or "/"
+                delay = (self.latency_ms + self.rng.uniform(0, self.jitter_ms)) / 1000.0
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                self.requests += 1
+                if self.rng.random() < self.error_rate:
+                    self.errors += 1
+                    status, body = 503, b"Service Unavailable"
+                else:
+                    status, body = self.render(path)
+                reason = "OK" if status == 200 else "Service Unavailable"
+                writer.write(
+                    f"HTTP/1.1 {status} {reason}\r\nContent-Type: text/html; charset=utf-8\r\n"
+                    f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1")
+                    + body
+                )
+                await writer.drain()
+                if not keep_alive:
+                    return
+        except (ConnectionError, IndexError):
+            return
+        finally:
+            writer.close()
+
+async def serve(site: MockSite, host: str, port: int, ready: Optional["object"] = None) -> None:
+    server = await asyncio.start_server(site.handle, host, port, backlog=1024)
+    if ready is not None:
+        ready.set()
+    async with server:
+        await server.serve_forever()
+
+def run_server(host: str, port: int, per_page: int, latency_ms: float, jitter_ms: float, error_rate: float, ready=None,
+               listings: int = 400) -> None:
+    """Process entry point (see bench.py)."""
+    site = MockSite(per_page, latency_ms, jitter_ms, error_rate, listings=listings)
+    asyncio.run(serve(site, host, port, ready))
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve the benchmark corpus as a fake apartments.com")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--per-page", type=int, default=40)
+    parser.add_argument("--listings", type=int, default=400, help="Listings covered by the search pager.")
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0)
+    args = parser.parse_args()
+    print(f"Serving corpus on http://{args.host}:{args.port} (use it as the http proxy)")
+    run_server(args.host, args.port, args.per_page, args.latency_ms, args.jitter_ms, args.error_rate, listings=args.listings)
+
+if __name__ == "__main__":
+    main()
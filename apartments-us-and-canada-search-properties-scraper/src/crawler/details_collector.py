@@ -1,29 +1,243 @@
 import asyncio
-from typing import Dict, Iterable, List
+from concurrent.futures import Executor
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Set, Tuple, Union
 
 import httpx
 
 from extractors.listing_parser import parse_listing_page
 
+from .metrics import METRICS, track_in_flight
+from .parse_pool import run_parser
+from .retry import is_retryable, retry_delay
+from .snapshots import content_fingerprint
+from .streaming import StreamOptions, get_page
+
+async def _fetch_page(
+    client: httpx.AsyncClient,
+    url: str,
+    sem: asyncio.Semaphore,
+    stream: Optional[StreamOptions] = None,
+):
+    """One attempt; the slot is held only for the request itself. Returns an httpx.Response or StreamedPage."""
+    async with sem:
+        with track_in_flight("detail"), METRICS.timer("fetch_seconds", {"kind": "detail"}):
+            r = await get_page(client, url, stream)
+        METRICS.inc("pages_fetched_total", labels={"kind": "detail"})
+        METRICS.inc("bytes_in_total", r.num_bytes_downloaded, {"kind": "detail"})
+        r.raise_for_status()
+        return r
+
+async def _parse_detail(
+    url: str,
+    r,
+    executor: Optional[Executor] = None,
+    fingerprints: Optional[Mapping[str, str]] = None,
+    fields: Optional[Sequence[str]] = None,
+) -> Dict:
+    # Incremental mode: identical HTML to the previous snapshot needs no parsing
+    fingerprint = None
+    if fingerprints is not None:
+        fingerprint = content_fingerprint(r.content)
+        if fingerprints.get(url) == fingerprint:
+            METRICS.inc("pages_unchanged_total")
+            return {"url": url, "_unchanged": True}
+    # Parse outside the semaphore so the slot goes back to fetching
+    try:
+        rec = await run_parser(executor, parse_listing_page, url, r.text, fields)
+    except Exception as e:
+        METRICS.inc("pages_failed_total", labels={"kind": "detail", "stage": "parse"})
+        return {"url": url, "_error": str(e)}
+    if fingerprint is not None:
+        rec["_fingerprint"] = fingerprint
+    if getattr(r, "truncated", False):
+        rec["_truncated"] = True
+    return rec
+
 async def _fetch_detail(
     client: httpx.AsyncClient,
     url: str,
     sem: asyncio.Semaphore,
     attempt: int,
     max_attempts: int,
-    backoff_ms: int,
-) -> Dict:
-    async with sem:
+    executor: Optional[Executor] = None,
+    fingerprints: Optional[Mapping[str, str]] = None,
+    fields: Optional[Sequence[str]] = None,
+    stream: Optional[StreamOptions] = None,
+) -> Union[Dict, BaseException]:
+    """
+    One attempt at a listing: its record, an `_error` record once attempts run
+    out, or the exception when it is worth retrying (the caller schedules that).
+    """
+    try:
+        r = await _fetch_page(client, url, sem, stream)
+    except Exception as e:
+        if attempt < max_attempts and is_retryable(e):
+            METRICS.inc("pages_retried_total", labels={"kind": "detail"})
+            return e
+        METRICS.inc("pages_failed_total", labels={"kind": "detail", "stage": "fetch"})
+        return {"url": url, "_error": str(e)}
+    return await _parse_detail(url, r, executor, fingerprints, fields)
+
+# (url, attempt) work items; None tells a worker to exit
+WorkItem = Optional[Tuple[str, int]]
+
+class _DetailWorkers:
+    """
+    `concurrency` detail workers over a bounded queue of URLs, shared by
+    `iter_listing_details` and the pipeline. A failed fetch is parked on a loop
+    timer and re-queued when due, so a URL in backoff holds neither a slot nor
+    a worker. `admit` (if given) sees each URL before its first attempt and
+    returns the URL to fetch, or None to drop it.
+    """
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        concurrency: int,
+        retry_attempts: int,
+        retry_backoff_base_ms: int,
+        queue_size: int,
+        executor: Optional[Executor] = None,
+        fingerprints: Optional[Mapping[str, str]] = None,
+        fields: Optional[Sequence[str]] = None,
+        stream: Optional[StreamOptions] = None,
+        sem: Optional[asyncio.Semaphore] = None,
+        admit: Optional[Callable[[str], Optional[str]]] = None,
+        results_size: int = 0,
+    ):
+        self.client = client
+        self.concurrency = concurrency
+        self.max_attempts = retry_attempts
+        self.backoff_ms = retry_backoff_base_ms
+        self.executor = executor
+        self.fingerprints = fingerprints
+        self.fields = fields
+        self.stream = stream
+        self.sem = sem or asyncio.Semaphore(concurrency)
+        self.admit = admit
+        self.queue: "asyncio.Queue[WorkItem]" = asyncio.Queue(maxsize=max(1, queue_size))
+        self.results: "asyncio.Queue[Dict]" = asyncio.Queue(maxsize=results_size)
+        # URLs queued, in flight or waiting for a retry; workers stop only at zero
+        self.outstanding = 0
+        self.drained = asyncio.Event()
+        self.drained.set()
+        self.requeues: Set[asyncio.Task] = set()
+        self.timers: Set[asyncio.TimerHandle] = set()
+
+    async def submit(self, url: str) -> None:
+        self.outstanding += 1
+        self.drained.clear()
+        # blocks while the queue is full, so producers can't run far ahead of the workers
+        await self.queue.put((url, 1))
+
+    def _finish(self) -> None:
+        self.outstanding -= 1
+        if self.outstanding == 0:
+            self.drained.set()
+
+    def _schedule_retry(self, url: str, attempt: int, exc: BaseException) -> None:
+        # The event loop's timer heap is the delay queue; the worker is free meanwhile
+        def requeue() -> None:
+            self.timers.discard(handle)
+            task = asyncio.ensure_future(self.queue.put((url, attempt + 1)))
+            self.requeues.add(task)
+            task.add_done_callback(self.requeues.discard)
+
+        handle = asyncio.get_running_loop().call_later(retry_delay(attempt, self.backoff_ms, exc), requeue)
+        self.timers.add(handle)
+
+    async def _worker(self) -> None:
+        while True:
+            item = await self.queue.get()
+            if item is None:
+                return
+            url, attempt = item
+            if attempt == 1 and self.admit is not None:
+                admitted = self.admit(url)
+                if admitted is None:
+                    self._finish()
+                    continue
+                url = admitted
+            rec = await _fetch_detail(
+                self.client, url, self.sem, attempt, self.max_attempts, self.executor, self.fingerprints, self.fields,
+                self.stream,
+            )
+            if isinstance(rec, BaseException):
+                self._schedule_retry(url, attempt, rec)
+                continue
+            await self.results.put(rec)
+            self._finish()
+
+    async def run(self, feed: Callable[[], Awaitable[None]]) -> AsyncIterator[Dict]:
+        """
+        Runs the workers while `feed` submits URLs and yields records in completion
+        order. Ends once `feed` has returned and every submitted URL is done.
+        """
+        workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+
+        async def feeder() -> None:
+            await feed()
+            await self.drained.wait()
+            for _ in workers:
+                await self.queue.put(None)
+
+        tasks = [asyncio.create_task(feeder())] + workers
+        done = asyncio.gather(*tasks)
         try:
-            r = await client.get(url, follow_redirects=True)
-            r.raise_for_status()
-            html = r.text
-            return parse_listing_page(url, html)
-        except Exception as e:
-            if attempt >= max_attempts:
-                return {"url": url, "_error": str(e)}
-            await asyncio.sleep((backoff_ms / 1000.0) * (2 ** (attempt - 1)))
-            return await _fetch_detail(client, url, sem, attempt + 1, max_attempts, backoff_ms)
+            while not (done.done() and self.results.empty()):
+                getter = asyncio.ensure_future(self.results.get())
+                await asyncio.wait({getter, done}, return_when=asyncio.FIRST_COMPLETED)
+                if getter.done():
+                    yield getter.result()
+                else:
+                    getter.cancel()
+            # surface unexpected worker/feeder failures
+            await done
+        finally:
+            if not done.done():
+                # cancelling the gather cancels feeder and workers, and leaves no unretrieved error behind
+                done.cancel()
+                await asyncio.gather(done, return_exceptions=True)
+            for handle in list(self.timers):
+                handle.cancel()
+            for task in list(self.requeues):
+                task.cancel()
+
+async def iter_listing_details(
+    client: httpx.AsyncClient,
+    listing_urls: Iterable[str],
+    concurrency: int = 10,
+    retry_attempts: int = 3,
+    retry_backoff_base_ms: int = 400,
+    executor: Optional[Executor] = None,
+    fingerprints: Optional[Mapping[str, str]] = None,
+    fields: Optional[Sequence[str]] = None,
+    stream: Optional[StreamOptions] = None,
+    sem: Optional[asyncio.Semaphore] = None,
+) -> AsyncIterator[Dict]:
+    """
+    Yields parsed records in completion order. URLs are taken from `listing_urls`
+    as workers free up, so it may be a lazy iterator (e.g. over a `Frontier`) and
+    nothing is created per URL up front; retries are scheduled as in
+    `_DetailWorkers`. Fetches take a slot of `sem` when given (shared with other
+    crawls), else of a private semaphore.
+    """
+    pool = _DetailWorkers(
+        client, concurrency, retry_attempts, retry_backoff_base_ms, concurrency, executor, fingerprints, fields,
+        stream, sem, results_size=concurrency,
+    )
+
+    async def feed() -> None:
+        for url in listing_urls:
+            await pool.submit(url)
+
+    records = pool.run(feed)
+    try:
+        async for rec in records:
+            yield rec
+    finally:
+        # an early close stops the workers now rather than at garbage collection
+        await records.aclose()
 
 async def collect_listing_details(
     client: httpx.AsyncClient,
@@ -31,14 +245,11 @@ async def collect_listing_details(
     concurrency: int = 10,
     retry_attempts: int = 3,
     retry_backoff_base_ms: int = 400,
+    executor: Optional[Executor] = None,
 ) -> List[Dict]:
-    sem = asyncio.Semaphore(concurrency)
-    tasks = [
-        asyncio.create_task(_fetch_detail(client, url, sem, 1, retry_attempts, retry_backoff_base_ms))
-        for url in listing_urls
-    ]
     results: List[Dict] = []
-    for t in asyncio.as_completed(tasks):
-        result = await t
+    async for result in iter_listing_details(
+        client, listing_urls, concurrency, retry_attempts, retry_backoff_base_ms, executor
+    ):
         results.append(result)
-    return results
\ No newline at end of file
+    return results
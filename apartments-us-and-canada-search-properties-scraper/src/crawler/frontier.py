@@ -0,0 +1,209 @@
+import hashlib
+import re
+import sqlite3
+from array import array
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Deque, Iterable, Iterator, List, Optional
+
+from .search_collector import APARTMENTS_HOST
+
+# scheme, host (userinfo and port dropped), path; query and fragment are ignored
+URL_PARTS_RE = re.compile(r"^\s*([a-z][a-z0-9+.-]*)://(?:[^/?#@]*@)?([^/?#:]*)(?::\d*)?([^?#]*)", re.IGNORECASE)
+# search_collector.DETAIL_URL_RE, on a canonical path: /<slug>/<listing id>/
+DETAIL_PATH_RE = re.compile(r"/[^\"'<>]+/([a-z0-9]{3,8})/$", re.IGNORECASE)
+
+def canonical_listing_url(url: str) -> Optional[str]:
+    """
+    Lowercase scheme/host (apex apartments.com becomes www.), drop query,
+    fragment and port, keep a single trailing slash. None for other hosts.
+    """
+    m = URL_PARTS_RE.match(url)
+    if m is None:
+        return None
+    scheme, host, path = m.group(1).lower(), m.group(2).lower(), m.group(3)
+    if host == APARTMENTS_HOST:
+        host = "www." + host
+    elif not host.endswith("." + APARTMENTS_HOST):
+        return None
+    return f"{scheme}://{host}{path.rstrip('/')}/"
+
+def _canonical_key(canonical: str) -> str:
+    m = DETAIL_PATH_RE.match(canonical, canonical.index("/", canonical.index("//") + 2))
+    return m.group(1).lower() if m else canonical
+
+def listing_key(url: str) -> str:
+    """The listing id from a detail URL slug (e.g. 'ymg5lhs'), else the canonical URL."""
+    canonical = canonical_listing_url(url)
+    return _canonical_key(canonical) if canonical is not None else url
+
+def fingerprint64(key: str) -> int:
+    """Stable signed 64-bit hash (fits an SQLite INTEGER); unlike hash(), the same in every process."""
+    digest = hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+class _FingerprintTable:
+    """
+    Open-addressing hash set of 64-bit ints in one flat array: 8 bytes a slot,
+    12-24 bytes an entry, against ~70 for a set of Python ints.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self.slots = array("q", bytes(8 * capacity))
+        self.mask = capacity - 1
+        self.count = 0
+
+    def add(self, fp: int) -> bool:
+        """False if `fp` was already present. 0 marks an empty slot, so it is stored as 1."""
+        fp = fp or 1
+        slots, mask = self.slots, self.mask
+        i = fp & mask
+        while True:
+            cur = slots[i]
+            if cur == 0:
+                break
+            if cur == fp:
+                return False
+            i = (i + 1) & mask
+        slots[i] = fp
+        self.count += 1
+        if self.count * 3 > len(slots) * 2:
+            self._grow()
+        return True
+
+    def _grow(self) -> None:
+        old = self.slots
+        self.slots = array("q", bytes(16 * len(old)))
+        self.mask = len(self.slots) - 1
+        self.count = 0
+        for fp in old:
+            if fp:
+                self.add(fp)
+
+class Frontier:
+    """
+    Listing URLs still to fetch plus a dedupe index of every listing admitted
+    so far. Listings are keyed by `listing_key`, so tracking params, host
+    spelling or a missing slash don't cause refetches, and stored as 64-bit
+    fingerprints instead of URL strings.
+
+    With `path` both the index and the pending URLs live in a throwaway SQLite
+    file, so memory stays flat however many listings are discovered; without
+    it they are kept in memory (fingerprints in a flat array). Resume state belongs to the journal, so the
+    file is cleared on open.
+    """
+
+    def __init__(self, path: Optional[str] = None, url_filter: Optional[Callable[[str], bool]] = None):
+        self.path = path
+        self.url_filter = url_filter
+        self.seen_count = 0
+        self.conn: Optional[sqlite3.Connection] = None
+        self._seen = _FingerprintTable()
+        self._pending: Deque[str] = deque()
+        if path:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            # autocommit with no rollback journal: nothing here needs to survive a crash
+            self.conn = sqlite3.connect(path, isolation_level=None)
+            self.conn.execute("PRAGMA journal_mode=OFF")
+            self.conn.execute("PRAGMA synchronous=OFF")
+            self.conn.executescript(
+                """
+                DROP TABLE IF EXISTS seen;
+                DROP TABLE IF EXISTS pending;
+                CREATE TABLE seen (fp INTEGER PRIMARY KEY) WITHOUT ROWID;
+                CREATE TABLE pending (id INTEGER PRIMARY KEY, url TEXT NOT NULL);
+                """
+            )
+
+    def close(self) -> None:
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def __enter__(self) -> "Frontier":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def _claim(self, fp: int) -> bool:
+        """Adds `fp` to the index; False if it was already there."""
+        if self.conn is not None:
+            if self.conn.execute("INSERT OR IGNORE INTO seen (fp) VALUES (?)", (fp,)).rowcount != 1:
+                return False
+        elif not self._seen.add(fp):
+            return False
+        self.seen_count += 1
+        return True
+
+    def _batched(self, fn: Callable[[str], Any], urls: Iterable[str]) -> int:
+        """Applies `fn` to each URL, in one transaction per 1000 on disk; counts truthy results."""
+        if self.conn is None:
+            return sum(1 for url in urls if fn(url))
+        n = 0
+        it = iter(urls)
+        while True:
+            self.conn.execute("BEGIN")
+            try:
+                for i, url in enumerate(it):
+                    if fn(url):
+                        n += 1
+                    if i == 999:
+                        break
+                else:
+                    return n
+            finally:
+                self.conn.execute("COMMIT")
+
+    def mark_seen(self, urls: Iterable[str]) -> None:
+        """Records listings as already handled (e.g. done in an earlier run) without queueing them."""
+        self._batched(lambda url: self._claim(fingerprint64(listing_key(url))), urls)
+
+    def admit(self, url: str) -> Optional[str]:
+        """
+        The canonical URL if this listing is new and passes the host check and
+        `url_filter`; it then counts as seen. None otherwise.
+        """
+        canonical = canonical_listing_url(url)
+        if canonical is None or (self.url_filter is not None and not self.url_filter(canonical)):
+            return None
+        if not self._claim(fingerprint64(_canonical_key(canonical))):
+            return None
+        return canonical
+
+    def add(self, url: str) -> bool:
+        """`admit`s the URL and queues it for fetching."""
+        canonical = self.admit(url)
+        if canonical is None:
+            return False
+        if self.conn is not None:
+            self.conn.execute("INSERT INTO pending (url) VALUES (?)", (canonical,))
+        else:
+            self._pending.append(canonical)
+        return True
+
+    def extend(self, urls: Iterable[str]) -> int:
+        """Adds each URL; returns how many were new."""
+        return self._batched(self.add, urls)
+
+    def pop_batch(self, size: int) -> List[str]:
+        """Up to `size` pending URLs in discovery order, removed from the frontier."""
+        if self.conn is None:
+            return [self._pending.popleft() for _ in range(min(size, len(self._pending)))]
+        rows = self.conn.execute("SELECT id, url FROM pending ORDER BY id LIMIT ?", (size,)).fetchall()
+        if rows:
+            self.conn.execute("DELETE FROM pending WHERE id <= ?", (rows[-1][0],))
+        return [url for _, url in rows]
+
+    def iter_batches(self, size: int = 500) -> Iterator[List[str]]:
+        """Drains the frontier batch by batch; URLs added meanwhile are picked up too."""
+        while True:
+            batch = self.pop_batch(size)
+            if not batch:
+                return
+            yield batch
+
+    def pending_count(self) -> int:
+        if self.conn is None:
+            return len(self._pending)
+        return self.conn.execute("SELECT COUNT(*) FROM pending").fetchone()[0]
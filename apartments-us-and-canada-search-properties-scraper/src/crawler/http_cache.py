@@ -0,0 +1,196 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+# Headers that no longer describe a stored body. Bodies are stored as they came
+# off the wire, so Content-Encoding stays (older entries were stored decoded,
+# without it; both load the same way).
+_DROP_HEADERS = {"content-length", "transfer-encoding", "connection", "keep-alive"}
+
+def normalize_url(url: httpx.URL) -> str:
+    """Cache key form of a URL: lowercase scheme/host, no default port or fragment, sorted query."""
+    port = url.port
+    if (url.scheme, port) in (("http", 80), ("https", 443)):
+        port = None
+    host = url.host.lower()
+    netloc = f"{host}:{port}" if port else host
+    path = url.path or "/"
+    query = "&".join(sorted(url.query.decode("ascii", "ignore").split("&"))) if url.query else ""
+    return f"{url.scheme.lower()}://{netloc}{path}" + (f"?{query}" if query else "")
+
+class ResponseCache:
+    """
+    Compressed on-disk store of GET responses, keyed by normalized URL, with a TTL
+    and size-bounded LRU eviction. Entries are `zlib(meta-json + "\\n" + body)`.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, ttl_secs: float):
+        self.dir = Path(directory)
+        self.max_bytes = max_bytes
+        self.ttl_secs = ttl_secs
+        self.dir.mkdir(parents=True, exist_ok=True)
+        # key -> size on disk, least recently used first
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._total = 0
+        # load/store run in worker threads
+        self._lock = threading.Lock()
+        self._load_index()
+
+    def _load_index(self) -> None:
+        entries = []
+        for p in self.dir.glob("*/*.z"):
+            st = p.stat()
+            entries.append((st.st_mtime, p.stem, st.st_size))
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._total += size
+
+    def _path(self, key: str) -> Path:
+        return self.dir / key[:2] / f"{key}.z"
+
+    @staticmethod
+    def key_for(url: httpx.URL) -> str:
+        return hashlib.sha1(normalize_url(url).encode("utf-8")).hexdigest()
+
+    def load(self, key: str) -> Optional[Tuple[Dict[str, Any], bytes]]:
+        path = self._path(key)
+        try:
+            blob = zlib.decompress(path.read_bytes())
+        except (OSError, zlib.error):
+            self._forget(key)
+            return None
+        meta_raw, _, body = blob.partition(b"\n")
+        os.utime(path)  # mtime doubles as the LRU clock across runs
+        with self._lock:
+            if key in self._index:
+                self._index.move_to_end(key)
+        return json.loads(meta_raw), body
+
+    def store(self, key: str, meta: Dict[str, Any], body: bytes) -> None:
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        blob = zlib.compress(json.dumps(meta).encode("utf-8") + b"\n" + body, 6)
+        tmp = path.with_suffix(f".{threading.get_ident()}.tmp")
+        tmp.write_bytes(blob)
+        os.replace(tmp, path)
+        with self._lock:
+            self._total -= self._index.pop(key, 0)
+            self._index[key] = len(blob)
+            self._total += len(blob)
+            evicted = []
+            while self._total > self.max_bytes and len(self._index) > 1:
+                old_key, size = self._index.popitem(last=False)
+                self._total -= size
+                evicted.append(old_key)
+        for old_key in evicted:
+            self._unlink(old_key)
+
+    def _forget(self, key: str) -> None:
+        with self._lock:
+            self._total -= self._index.pop(key, 0)
+        self._unlink(key)
+
+    def _unlink(self, key: str) -> None:
+        try:
+            self._path(key).unlink()
+        except OSError:
+            pass
+
+    def is_fresh(self, meta: Dict[str, Any]) -> bool:
+        return time.time() - meta.get("stored_at", 0) < self.ttl_secs
+
+class _TeeStream(httpx.AsyncByteStream):
+    """Passes a response body through untouched and hands it to `on_complete` once it was read to the end."""
+
+    def __init__(self, inner: httpx.AsyncByteStream, on_complete: Callable[[bytes], Awaitable[None]]):
+        self.inner = inner
+        self.on_complete = on_complete
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        chunks: List[bytes] = []
+        async for chunk in self.inner:
+            chunks.append(chunk)
+            yield chunk
+        await self.on_complete(b"".join(chunks))
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+class CachingTransport(httpx.AsyncBaseTransport):
+    """
+    Serves GETs from a `ResponseCache`. Fresh entries skip the network; stale ones are
+    revalidated with If-None-Match / If-Modified-Since when the server gave validators.
+    With `offline=True` every cached entry is served as-is and misses return 504.
+
+    Network bodies stream through to the caller and are stored only once it has
+    read them to the end, so a reader that stops early (`stream.max_kb`, early
+    stop) still drops the connection instead of downloading the rest for the cache.
+    """
+
+    def __init__(self, inner: httpx.AsyncBaseTransport, cache: ResponseCache, offline: bool = False):
+        self.inner = inner
+        self.cache = cache
+        self.offline = offline
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        if request.method != "GET":
+            return await self.inner.handle_async_request(request)
+
+        key = ResponseCache.key_for(request.url)
+        cached = await asyncio.to_thread(self.cache.load, key)
+        if cached is not None:
+            meta, body = cached
+            if self.offline or self.cache.is_fresh(meta):
+                return self._build(request, meta, body)
+            if meta.get("etag"):
+                request.headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                request.headers["If-Modified-Since"] = meta["last_modified"]
+        elif self.offline:
+            return httpx.Response(504, request=request, content=b"not in offline cache")
+
+        response = await self.inner.handle_async_request(request)
+        if response.status_code == 304 and cached is not None:
+            await response.aclose()
+            meta, body = cached
+            meta["stored_at"] = time.time()
+            await asyncio.to_thread(self.cache.store, key, meta, body)
+            return self._build(request, meta, body)
+        if response.status_code != 200:
+            return response
+
+        headers = [(k, v) for k, v in response.headers.multi_items() if k.lower() not in _DROP_HEADERS]
+        meta = {
+            "status": response.status_code,
+            "headers": headers,
+            "etag": response.headers.get("etag"),
+            "last_modified": response.headers.get("last-modified"),
+        }
+
+        async def store(body: bytes) -> None:
+            meta["stored_at"] = time.time()
+            await asyncio.to_thread(self.cache.store, key, meta, body)
+
+        return httpx.Response(
+            response.status_code,
+            headers=response.headers,
+            stream=_TeeStream(response.stream, store),
+            request=request,
+            extensions=response.extensions,
+        )
+
+    @staticmethod
+    def _build(request: httpx.Request, meta: Dict[str, Any], body: bytes) -> httpx.Response:
+        return httpx.Response(meta["status"], headers=meta["headers"], content=body, request=request)
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
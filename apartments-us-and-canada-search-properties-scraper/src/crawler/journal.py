@@ -0,0 +1,99 @@
+import json
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, Set
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+class CrawlJournal:
+    """
+    SQLite-backed crawl journal: per-URL state plus the parsed record of every
+    completed listing. Each update is committed right away (WAL mode), so a killed
+    process loses at most the requests that were in flight.
+    """
+
+    def __init__(self, path: str, reset: bool = False):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS urls (
+                url TEXT PRIMARY KEY,
+                state TEXT NOT NULL,
+                error TEXT,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS records (
+                url TEXT PRIMARY KEY,
+                data TEXT NOT NULL
+            );
+            """
+        )
+        if reset:
+            self.conn.execute("DELETE FROM urls")
+            self.conn.execute("DELETE FROM records")
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "CrawlJournal":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def mark_pending(self, urls: Iterable[str]) -> None:
+        now = time.time()
+        self.conn.executemany(
+            "INSERT INTO urls (url, state, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(url) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at "
+            "WHERE urls.state != 'done'",
+            [(u, PENDING, now) for u in urls],
+        )
+        self.conn.commit()
+
+    def record(self, rec: Dict[str, Any]) -> None:
+        """
+        Stores a finished record; records carrying `_error` mark the URL failed and
+        incremental `_unchanged` stubs mark it done without storing anything.
+        """
+        url = rec.get("url")
+        if not url:
+            return
+        now = time.time()
+        if rec.get("_error"):
+            self.conn.execute(
+                "INSERT OR REPLACE INTO urls (url, state, error, updated_at) VALUES (?, ?, ?, ?)",
+                (url, FAILED, str(rec["_error"]), now),
+            )
+        else:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO urls (url, state, error, updated_at) VALUES (?, ?, NULL, ?)",
+                (url, DONE, now),
+            )
+        if not rec.get("_error") and not rec.get("_unchanged"):
+            self.conn.execute(
+                "INSERT OR REPLACE INTO records (url, data) VALUES (?, ?)",
+                (url, json.dumps(rec, ensure_ascii=False)),
+            )
+        self.conn.commit()
+
+    def done_urls(self) -> Set[str]:
+        return set(self.iter_done_urls())
+
+    def iter_done_urls(self) -> Iterator[str]:
+        for (url,) in self.conn.execute("SELECT url FROM urls WHERE state = ?", (DONE,)):
+            yield url
+
+    def iter_records(self) -> Iterator[Dict[str, Any]]:
+        for (data,) in self.conn.execute("SELECT data FROM records ORDER BY rowid"):
+            yield json.loads(data)
+
+    def counts(self) -> Dict[str, int]:
+        return dict(self.conn.execute("SELECT state, COUNT(*) FROM urls GROUP BY state").fetchall())
@@ -0,0 +1,254 @@
+import asyncio
+import bisect
+import cProfile
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+# Histogram bucket upper bounds in seconds (Prometheus `le` values)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+def _labels(labels: Optional[Dict[str, str]]) -> Labels:
+    return tuple(sorted((labels or {}).items()))
+
+def _fmt_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    items = list(labels) + ([extra] if extra else [])
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in items) + "}"
+
+class _Histogram:
+    __slots__ = ("counts", "sum", "count", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bound of the bucket holding the q-th observation."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(LATENCY_BUCKETS, self.counts):
+            seen += n
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+class Metrics:
+    """
+    In-process counters, gauges and latency histograms. Cheap enough to stay on
+    for every run; reporting (stats file / Prometheus) is opt-in. Parse workers
+    record into `capture()` and the parent `replay()`s what they send back.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.gauges: Dict[Tuple[str, Labels], float] = {}
+        self.gauge_fns: Dict[Tuple[str, Labels], Callable[[], float]] = {}
+        self.histograms: Dict[Tuple[str, Labels], _Histogram] = {}
+        self.started = time.time()
+        # (kind, name, labels, value) records; kind is "inc" or "observe"
+        self._capture: Optional[List[Tuple[str, str, Labels, float]]] = None
+
+    def inc(self, name: str, value: float = 1, labels: Optional[Dict[str, str]] = None) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+            if self._capture is not None:
+                self._capture.append(("inc", name, key[1], value))
+
+    def total(self, name: str) -> float:
+        """Counter value summed over all label sets."""
+        with self._lock:
+            return sum(v for (n, _), v in self.counters.items() if n == name)
+
+    def add_gauge(self, name: str, delta: float, labels: Optional[Dict[str, str]] = None) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            self.gauges[key] = self.gauges.get(key, 0) + delta
+
+    def gauge_fn(self, name: str, fn: Optional[Callable[[], float]], labels: Optional[Dict[str, str]] = None) -> None:
+        """Gauge read from `fn` at report time; None unregisters it."""
+        key = (name, _labels(labels))
+        if fn is None:
+            self.gauge_fns.pop(key, None)
+        else:
+            self.gauge_fns[key] = fn
+
+    def observe(self, name: str, seconds: float, labels: Optional[Dict[str, str]] = None) -> None:
+        key = (name, _labels(labels))
+        with self._lock:
+            h = self.histograms.get(key)
+            if h is None:
+                h = self.histograms[key] = _Histogram()
+            h.observe(seconds)
+            if self._capture is not None:
+                self._capture.append(("observe", name, key[1], seconds))
+
+    @contextmanager
+    def timer(self, name: str, labels: Optional[Dict[str, str]] = None) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, labels)
+
+    @contextmanager
+    def capture(self) -> Iterator[List[Tuple[str, str, Labels, float]]]:
+        """Collects counter increments and observations made inside the block (used in parse worker processes)."""
+        prev = self._capture
+        self._capture = captured = []
+        try:
+            yield captured
+        finally:
+            self._capture = prev
+
+    def replay(self, captured: List[Tuple[str, str, Labels, float]]) -> None:
+        for kind, name, labels, value in captured:
+            if kind == "inc":
+                self.inc(name, value, dict(labels))
+            else:
+                self.observe(name, value, dict(labels))
+
+    def _gauge_values(self) -> Dict[Tuple[str, Labels], float]:
+        values = dict(self.gauges)
+        for key, fn in list(self.gauge_fns.items()):
+            try:
+                values[key] = fn()
+            except Exception:
+                continue
+        return values
+
+    def snapshot(self) -> Dict[str, Any]:
+        def name_of(key: Tuple[str, Labels]) -> str:
+            return key[0] + _fmt_labels(key[1])
+
+        with self._lock:
+            histograms = {
+                name_of(k): {
+                    "count": h.count,
+                    "mean_ms": round(h.sum / h.count * 1000, 2) if h.count else None,
+                    "p50_ms": round(h.quantile(0.5) * 1000, 2) if h.count else None,
+                    "p95_ms": round(h.quantile(0.95) * 1000, 2) if h.count else None,
+                    "max_ms": round(h.max * 1000, 2),
+                }
+                for k, h in sorted(self.histograms.items())
+            }
+            counters = {name_of(k): v for k, v in sorted(self.counters.items())}
+        return {
+            "uptime_secs": round(time.time() - self.started, 1),
+            "counters": counters,
+            "gauges": {name_of(k): v for k, v in sorted(self._gauge_values().items())},
+            "histograms": histograms,
+        }
+
+    def to_prometheus(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            for (name, labels), v in sorted(self.counters.items()):
+                lines.append(f"{name}{_fmt_labels(labels)} {v}")
+            for (name, labels), h in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, n in zip(LATENCY_BUCKETS, h.counts):
+                    cumulative += n
+                    lines.append(f"{name}_bucket{_fmt_labels(labels, ('le', str(bound)))} {cumulative}")
+                lines.append(f"{name}_bucket{_fmt_labels(labels, ('le', '+Inf'))} {h.count}")
+                lines.append(f"{name}_sum{_fmt_labels(labels)} {h.sum}")
+                lines.append(f"{name}_count{_fmt_labels(labels)} {h.count}")
+        for (name, labels), v in sorted(self._gauge_values().items()):
+            lines.append(f"{name}{_fmt_labels(labels)} {v}")
+        return "\n".join(lines) + "\n"
+
+    def write_stats_file(self, path: str) -> None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(tmp, path)
+
+METRICS = Metrics()
+
+@contextmanager
+def track_in_flight(kind: str) -> Iterator[None]:
+    labels = {"kind": kind}
+    METRICS.add_gauge("crawl_in_flight_requests", 1, labels)
+    try:
+        yield
+    finally:
+        METRICS.add_gauge("crawl_in_flight_requests", -1, labels)
+
+async def stats_file_reporter(path: str, interval_secs: float) -> None:
+    """Rewrites `path` with a JSON snapshot every `interval_secs` until cancelled."""
+    while True:
+        await asyncio.sleep(interval_secs)
+        await asyncio.to_thread(METRICS.write_stats_file, path)
+
+async def start_prometheus_server(host: str, port: int) -> asyncio.AbstractServer:
+    """Minimal HTTP endpoint serving the text exposition format on any GET path."""
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            # request line + headers; the path is ignored
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            body = METRICS.to_prometheus().encode("utf-8")
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                b"Content-Type: text/plain; version=0.0.4\r\n"
+                + f"Content-Length: {len(body)}\r\n".encode()
+                + b"Connection: close\r\n\r\n"
+                + body
+            )
+            await writer.drain()
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
+
+class SlowPageProfiler:
+    """
+    Profiles a random `sample_rate` share of parse calls with cProfile and keeps
+    the .prof dump only when the call took longer than `slow_ms`. Picklable, so
+    it travels with each job into parse worker processes.
+    """
+
+    def __init__(self, sample_rate: float, slow_ms: float, out_dir: str):
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.out_dir = out_dir
+
+    def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if random.random() >= self.sample_rate:
+            return fn(*args)
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            return profiler.runcall(fn, *args)
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if elapsed_ms >= self.slow_ms:
+                Path(self.out_dir).mkdir(parents=True, exist_ok=True)
+                label = args[0] if args and isinstance(args[0], str) else fn.__name__
+                name = f"{int(time.time() * 1000)}-{os.getpid()}-{int(elapsed_ms)}ms.prof"
+                profiler.dump_stats(str(Path(self.out_dir) / name))
+                with open(Path(self.out_dir) / "index.tsv", "a", encoding="utf-8") as f:
+                    f.write(f"{name}\t{elapsed_ms:.1f}\t{label}\n")
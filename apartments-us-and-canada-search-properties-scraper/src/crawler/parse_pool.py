@@ -0,0 +1,61 @@
+import asyncio
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, List, Optional, Tuple, TypeVar
+
+from .metrics import METRICS, SlowPageProfiler
+
+T = TypeVar("T")
+
+# Optional slow-page profiler applied to every parse call (see `set_profiler`)
+_PROFILER: Optional[SlowPageProfiler] = None
+
+def set_profiler(profiler: Optional[SlowPageProfiler]) -> None:
+    global _PROFILER
+    _PROFILER = profiler
+
+@contextmanager
+def make_parse_pool(workers: Optional[int]) -> Iterator[Optional[Executor]]:
+    """
+    Yields a process pool for CPU-bound HTML parsing, or None when `workers` is 0/None,
+    in which case parsing stays inline on the event loop.
+    """
+    if not workers or workers <= 0:
+        yield None
+        return
+    pool = ProcessPoolExecutor(max_workers=workers)
+    try:
+        yield pool
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+async def warm_parse_pool(executor: Optional[Executor], workers: Optional[int]) -> None:
+    """Starts every worker process now (the pool spawns them on demand) so the first parses don't wait for it."""
+    if executor is None or not workers:
+        return
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(*(loop.run_in_executor(executor, abs, 0) for _ in range(workers)))
+
+def _timed_call(profiler: Optional[SlowPageProfiler], fn: Callable[..., T], *args: Any) -> T:
+    with METRICS.timer("parse_seconds", {"parser": fn.__name__}):
+        if profiler is not None:
+            return profiler.run(fn, *args)
+        return fn(*args)
+
+def _worker_call(profiler: Optional[SlowPageProfiler], fn: Callable[..., T], *args: Any) -> Tuple[T, List[Any]]:
+    # runs in a pool process: hand the timings back with the result
+    with METRICS.capture() as observations:
+        result = _timed_call(profiler, fn, *args)
+    return result, observations
+
+async def run_parser(executor: Optional[Executor], fn: Callable[..., T], *args: Any) -> T:
+    """
+    Runs a module-level (picklable) parse function in `executor`, or inline without
+    one. Either way its timings (and any extractor timings inside) land in METRICS.
+    """
+    if executor is None:
+        return _timed_call(_PROFILER, fn, *args)
+    loop = asyncio.get_running_loop()
+    result, observations = await loop.run_in_executor(executor, _worker_call, _PROFILER, fn, *args)
+    METRICS.replay(observations)
+    return result
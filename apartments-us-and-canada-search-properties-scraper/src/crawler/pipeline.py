@@ -0,0 +1,149 @@
+import asyncio
+from concurrent.futures import Executor
+from typing import AsyncIterator, Callable, Dict, Iterable, Mapping, Optional, Sequence
+
+import httpx
+
+from .details_collector import _DetailWorkers
+from .frontier import Frontier
+from .metrics import METRICS
+from .search_collector import Pagination, crawl_search
+from .streaming import StreamOptions
+
+class _Pipeline:
+    """Shared state for one pipelined crawl: detail workers, dedupe frontier, search pagination."""
+
+    def __init__(
+        self,
+        client: httpx.AsyncClient,
+        concurrency: int,
+        retry_attempts: int,
+        retry_backoff_base_ms: int,
+        queue_size: int,
+        executor: Optional[Executor],
+        skip_urls: Iterable[str],
+        on_accept: Optional[Callable[[str], None]],
+        fingerprints: Optional[Mapping[str, str]],
+        url_filter: Optional[Callable[[str], bool]],
+        frontier: Optional[Frontier],
+        fields: Optional[Sequence[str]],
+        search_stream: Optional[StreamOptions],
+        detail_stream: Optional[StreamOptions],
+        pagination: Optional[Pagination],
+        sem: Optional[asyncio.Semaphore],
+    ):
+        self.client = client
+        self.pagination = pagination
+        self.search_stream = search_stream
+        self.max_attempts = retry_attempts
+        self.backoff_ms = retry_backoff_base_ms
+        self.executor = executor
+        self.on_accept = on_accept
+        if frontier is None:
+            frontier = Frontier(url_filter=url_filter)
+        frontier.mark_seen(skip_urls)
+        self.frontier = frontier
+        # the bounded queue blocks search pages that pile up listing URLs
+        # faster than the detail workers can drain them
+        self.details = _DetailWorkers(
+            client, concurrency, retry_attempts, retry_backoff_base_ms, queue_size, executor, fingerprints, fields,
+            detail_stream, sem, admit=self._admit,
+        )
+        self.sem = self.details.sem
+
+    def _admit(self, url: str) -> Optional[str]:
+        canonical = self.frontier.admit(url)
+        if canonical is not None and self.on_accept is not None:
+            self.on_accept(canonical)
+        return canonical
+
+    async def _submit_all(self, links: Iterable[str]) -> None:
+        for link in links:
+            await self.details.submit(link)
+
+    async def search(self, url: str) -> None:
+        await crawl_search(
+            self.client,
+            url,
+            self.sem,
+            self._submit_all,
+            self.max_attempts,
+            self.backoff_ms,
+            self.executor,
+            self.search_stream,
+            self.pagination,
+        )
+
+async def iter_pipelined_details(
+    client: httpx.AsyncClient,
+    search_urls: Iterable[str],
+    listing_urls: Iterable[str] = (),
+    concurrency: int = 10,
+    retry_attempts: int = 3,
+    retry_backoff_base_ms: int = 400,
+    queue_size: int = 1000,
+    executor: Optional[Executor] = None,
+    skip_urls: Iterable[str] = (),
+    on_accept: Optional[Callable[[str], None]] = None,
+    fingerprints: Optional[Mapping[str, str]] = None,
+    url_filter: Optional[Callable[[str], bool]] = None,
+    fields: Optional[Sequence[str]] = None,
+    search_stream: Optional[StreamOptions] = None,
+    detail_stream: Optional[StreamOptions] = None,
+    frontier: Optional[Frontier] = None,
+    pagination: Optional[Pagination] = None,
+    sem: Optional[asyncio.Semaphore] = None,
+) -> AsyncIterator[Dict]:
+    """
+    Overlaps search and detail fetching: listing URLs found on search pages are
+    pushed into a bounded queue as soon as each page is parsed and detail workers
+    consume them right away. Records are yielded in completion order.
+
+    Failed fetches are parked on a timer and re-queued when due, so a worker never
+    sleeps through a backoff. URLs in `skip_urls` are treated as already fetched;
+    `on_accept` is called with each URL right before its detail fetch starts.
+    `fingerprints` enables the incremental skip in `_parse_detail`. Listing URLs
+    are canonicalized and deduped through `frontier` (an in-memory one built
+    with `url_filter` when not given); rejected ones (e.g. another shard's) are
+    dropped before fetching.
+    `fields` is the record projection passed to `parse_listing_page`; the stream
+    options switch search/detail fetches to `stream_page`. With `pagination`,
+    search URLs pointing at a first page also feed their later result pages.
+    Fetches take slots of `sem` when given, so several crawls can share one limit.
+    """
+    p = _Pipeline(
+        client,
+        concurrency,
+        retry_attempts,
+        retry_backoff_base_ms,
+        queue_size,
+        executor,
+        skip_urls,
+        on_accept,
+        fingerprints,
+        url_filter,
+        frontier,
+        fields,
+        search_stream,
+        detail_stream,
+        pagination,
+        sem,
+    )
+    details = p.details
+    METRICS.gauge_fn("crawl_queue_depth", details.queue.qsize)
+    METRICS.gauge_fn("crawl_retries_waiting", lambda: len(details.timers) + len(details.requeues))
+
+    async def feed() -> None:
+        for url in listing_urls:
+            await details.submit(url)
+        await asyncio.gather(*(p.search(url) for url in search_urls))
+
+    records = details.run(feed)
+    try:
+        async for rec in records:
+            yield rec
+    finally:
+        # an early close stops the workers now rather than at garbage collection
+        await records.aclose()
+        METRICS.gauge_fn("crawl_queue_depth", None)
+        METRICS.gauge_fn("crawl_retries_waiting", None)
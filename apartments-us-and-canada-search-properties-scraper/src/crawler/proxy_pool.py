@@ -0,0 +1,153 @@
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+# Responses that suggest this exit IP is being blocked or throttled
+BLOCK_STATUSES = {403, 407, 429}
+
+def parse_proxy_list(proxies: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Proxy entries from proxies.json's `proxies` list. Items are either a URL string
+    or {"url": ..., "http2": bool, "weight": float}. Returns [] for the legacy
+    single {"http", "https"} form. `http2` needs the `h2` package; without it
+    this raises RuntimeError up front instead of failing every HTTPS request.
+    """
+    out: List[Dict[str, Any]] = []
+    for item in (proxies or {}).get("proxies") or []:
+        if isinstance(item, str):
+            item = {"url": item}
+        if not item.get("url"):
+            continue
+        out.append({"url": item["url"], "http2": bool(item.get("http2", False)), "weight": float(item.get("weight", 1.0))})
+    if any(p["http2"] for p in out):
+        try:
+            import h2  # noqa: F401
+        except ImportError as e:
+            raise RuntimeError("proxies with `http2` require the `h2` package (pip install 'httpx[http2]')") from e
+    return out
+
+def proxy_label(url: str) -> str:
+    """Proxy URL without credentials, for logs and limiter keys."""
+    u = httpx.URL(url)
+    return f"{u.scheme}://{u.host}" + (f":{u.port}" if u.port else "")
+
+class _ProxyHealth:
+    def __init__(self, url: str, transport: httpx.AsyncBaseTransport, weight: float):
+        self.url = url
+        self.transport = transport
+        self.weight = weight
+        self.success = 1.0  # EWMA of success (1) / failure (0)
+        self.latency: Optional[float] = None  # EWMA seconds to response headers
+        self.failures_in_row = 0
+        self.benched_until = 0.0
+        self.bench_secs = 0.0
+        self.requests = 0
+        self.in_flight = 0
+
+    def score(self) -> float:
+        if self.latency is None:
+            # untried (or never succeeded since coming back): worth exploring first
+            return float("inf") if self.requests == 0 else self.weight * max(self.success, 0.01)
+        latency = self.latency
+        return self.weight * max(self.success, 0.01) / (max(latency, 0.01) * (1 + self.in_flight))
+
+class ProxyPoolTransport(httpx.AsyncBaseTransport):
+    """
+    Spreads requests across several proxies, each with its own connection pool
+    (and optional HTTP/2). Picks the better of two random healthy proxies by
+    score = weight * success rate / (latency * (1 + in-flight)). A proxy that
+    fails `max_failures` times in a row, or whose success rate drops below
+    `min_success`, is benched with exponential cooldown and then retried. A small
+    `explore` share of requests goes to a random healthy proxy so low scores can recover.
+    """
+
+    def __init__(
+        self,
+        proxies: List[Dict[str, Any]],
+        limits: httpx.Limits,
+        wrap=None,
+        max_failures: int = 3,
+        min_success: float = 0.5,
+        bench_secs: float = 30.0,
+        max_bench_secs: float = 600.0,
+        explore: float = 0.05,
+    ):
+        self.explore = explore
+        self.max_failures = max_failures
+        self.min_success = min_success
+        self.base_bench_secs = bench_secs
+        self.max_bench_secs = max_bench_secs
+        self.entries: List[_ProxyHealth] = []
+        self._closed = False
+        for p in proxies:
+            transport: httpx.AsyncBaseTransport = httpx.AsyncHTTPTransport(limits=limits, http2=p["http2"], proxy=p["url"])
+            if wrap is not None:
+                transport = wrap(transport, proxy_label(p["url"]))
+            self.entries.append(_ProxyHealth(p["url"], transport, p["weight"]))
+
+    def _pick(self) -> _ProxyHealth:
+        now = time.monotonic()
+        healthy = [e for e in self.entries if e.benched_until <= now]
+        if not healthy:
+            # everything is benched: use whichever comes back first
+            return min(self.entries, key=lambda e: e.benched_until)
+        if len(healthy) == 1:
+            return healthy[0]
+        if random.random() < self.explore:
+            return random.choice(healthy)
+        a, b = random.sample(healthy, 2)
+        return a if a.score() >= b.score() else b
+
+    def _record(self, e: _ProxyHealth, ok: bool, latency: float) -> None:
+        e.success = 0.9 * e.success + 0.1 * (1.0 if ok else 0.0)
+        if ok:
+            e.failures_in_row = 0
+            e.bench_secs = 0.0
+            e.latency = latency if e.latency is None else 0.8 * e.latency + 0.2 * latency
+            return
+        e.failures_in_row += 1
+        if e.failures_in_row >= self.max_failures or e.success < self.min_success:
+            e.bench_secs = min(self.max_bench_secs, (e.bench_secs * 2) or self.base_bench_secs)
+            e.benched_until = time.monotonic() + e.bench_secs
+            e.failures_in_row = 0
+            # give it a fair start when it comes back
+            e.success = max(e.success, self.min_success)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        e = self._pick()
+        e.requests += 1
+        e.in_flight += 1
+        started = time.monotonic()
+        try:
+            response = await e.transport.handle_async_request(request)
+        except httpx.TransportError:
+            self._record(e, False, time.monotonic() - started)
+            raise
+        finally:
+            e.in_flight -= 1
+        self._record(e, response.status_code not in BLOCK_STATUSES, time.monotonic() - started)
+        return response
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        return [
+            {
+                "proxy": proxy_label(e.url),
+                "score": round(e.score(), 3) if e.latency is not None else None,
+                "success": round(e.success, 3),
+                "latency_ms": round(e.latency * 1000, 1) if e.latency is not None else None,
+                "requests": e.requests,
+                "benched_secs": round(max(0.0, e.benched_until - now), 1),
+            }
+            for e in self.entries
+        ]
+
+    async def aclose(self) -> None:
+        # mounted for both http:// and https://, so the client closes it twice
+        if self._closed:
+            return
+        self._closed = True
+        for e in self.entries:
+            await e.transport.aclose()
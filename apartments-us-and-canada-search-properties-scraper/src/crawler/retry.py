@@ -0,0 +1,29 @@
+import random
+from typing import Optional
+
+import httpx
+
+from .throttling import parse_retry_after
+
+# Worth another attempt: throttling, timeouts and transient server errors
+RETRYABLE_STATUSES = {403, 408, 425, 429, 500, 502, 503, 504}
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code in RETRYABLE_STATUSES
+    # connect/read timeouts, resets, protocol hiccups
+    return isinstance(exc, httpx.TransportError)
+
+def retry_delay(attempt: int, backoff_ms: int, exc: Optional[BaseException] = None) -> float:
+    """
+    Seconds to wait before attempt `attempt + 1`: exponential backoff with +-50%
+    jitter so failures from one burst do not come back in lockstep. A server
+    Retry-After wins when it asks for longer.
+    """
+    base = (backoff_ms / 1000.0) * (2 ** (attempt - 1))
+    delay = base * random.uniform(0.5, 1.5)
+    if isinstance(exc, httpx.HTTPStatusError):
+        retry_after = parse_retry_after(exc.response.headers.get("retry-after"))
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+    return delay
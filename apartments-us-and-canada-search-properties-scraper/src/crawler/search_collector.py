@@ -1,27 +1,97 @@
 import asyncio
+import html as html_lib
 import re
-from typing import Iterable, List, Set
+from concurrent.futures import Executor
+from typing import AsyncIterator, Awaitable, Callable, Iterable, List, Optional, Set, Tuple
 
 import httpx
 from bs4 import BeautifulSoup
 
+from .metrics import METRICS, track_in_flight
+from .parse_pool import run_parser
+from .retry import is_retryable, retry_delay
+from .streaming import StreamOptions, get_page
+
 APARTMENTS_HOST = "apartments.com"
 
 # Regex catches typical detail URLs like:
 # https://www.apartments.com/904-pittsburg-ave-winston-salem-nc/ymg5lhs/
 DETAIL_URL_RE = re.compile(r"https?://(?:www\.)?apartments\.com/[^\"'<>]+?/[a-z0-9]{3,8}/", re.IGNORECASE)
+# Raw href attribute values on anchors; used instead of a DOM for the fast path
+ANCHOR_HREF_RE = re.compile(r"""<a\s[^>]*?\bhref\s*=\s*(?:"([^"]*)"|'([^']*)')""", re.IGNORECASE)
+# "Page 1 of 28" in the result header
+PAGE_RANGE_RE = re.compile(r"\bPage\s+\d+\s+of\s+(\d+)", re.IGNORECASE)
+# The pager block and the page numbers its links point at
+PAGING_NAV_RE = re.compile(r"""<(nav|div)\b[^>]*\bpaging\b[^>]*>(.*?)</\1>""", re.IGNORECASE | re.DOTALL)
+PAGE_LINK_RE = re.compile(r"""data-page\s*=\s*["']?(\d+)|href\s*=\s*["'][^"']*?/(\d+)/?(?:[?#][^"']*)?["']""", re.IGNORECASE)
+# Trailing page number on a search URL path: .../winston-salem-nc/3/
+SEARCH_PAGE_RE = re.compile(r"^(.*?/)(\d+)/?$")
+
+class Pagination:
+    """
+    Follows the pager of search URLs that point at their first page: the page
+    count is read from that page and pages 2..N are fetched concurrently
+    (`max_pages` caps N; 0 = no cap). With `is_new`, pages are fetched in
+    windows of `window` and the walk stops after a window containing a page that
+    loaded and listed only known listings (`stopped_early` is then set); a page
+    that failed doesn't count. Shared by all search URLs of one crawl so no
+    page is requested twice.
+    """
+
+    def __init__(self, max_pages: int = 0, is_new: Optional[Callable[[str], bool]] = None, window: int = 10):
+        self.max_pages = max_pages
+        self.is_new = is_new
+        self.window = max(1, window)
+        self.requested: Set[str] = set()
+        self.stopped_early = False
+
+def search_page_url(url: str, page: int) -> str:
+    """`url` switched to result page `page` (page 1 has no number), query string kept."""
+    base, sep, rest = url.partition("?")
+    m = SEARCH_PAGE_RE.match(base)
+    if m:
+        base = m.group(1)
+    elif not base.endswith("/"):
+        base += "/"
+    if page > 1:
+        base += f"{page}/"
+    return base + sep + rest
+
+def search_page_number(url: str) -> int:
+    m = SEARCH_PAGE_RE.match(url.partition("?")[0])
+    return int(m.group(2)) if m else 1
+
+def _page_count(html: str) -> int:
+    m = PAGE_RANGE_RE.search(html)
+    if m:
+        return int(m.group(1))
+    pages = 1
+    for nav in PAGING_NAV_RE.finditer(html):
+        for link in PAGE_LINK_RE.finditer(nav.group(2)):
+            pages = max(pages, int(link.group(1) or link.group(2)))
+    return pages
 
-async def _fetch(client: httpx.AsyncClient, url: str) -> str:
-    r = await client.get(url, follow_redirects=True)
+async def _fetch(client: httpx.AsyncClient, url: str, stream: Optional[StreamOptions] = None) -> str:
+    with track_in_flight("search"), METRICS.timer("fetch_seconds", {"kind": "search"}):
+        r = await get_page(client, url, stream)
+    METRICS.inc("pages_fetched_total", labels={"kind": "search"})
+    METRICS.inc("bytes_in_total", r.num_bytes_downloaded, {"kind": "search"})
     r.raise_for_status()
     return r.text
 
 def _extract_detail_links(html: str) -> Set[str]:
     links: Set[str] = set()
-    # Prefer fast regex, then validate via parsing
+    # Prefer fast regex over the raw page plus anchor hrefs pulled straight from the markup
     for m in DETAIL_URL_RE.finditer(html):
         links.add(m.group(0))
+    for m in ANCHOR_HREF_RE.finditer(html):
+        href = html_lib.unescape(m.group(1) or m.group(2) or "")
+        if APARTMENTS_HOST in href and DETAIL_URL_RE.search(href):
+            links.add(href)
+    if links:
+        return links
 
+    # Nothing matched: fall back to a full parse in case the markup is unusual
     soup = BeautifulSoup(html, "lxml")
     for a in soup.find_all("a", href=True):
         href = a["href"]
@@ -29,16 +99,124 @@ def _extract_detail_links(html: str) -> Set[str]:
             links.add(href)
     return links
 
-async def _collect_from_one(client: httpx.AsyncClient, url: str, sem: asyncio.Semaphore, attempt: int = 1, max_attempts: int = 3, backoff_ms: int = 400) -> Set[str]:
-    async with sem:
+def _parse_search_page(html: str) -> Tuple[Set[str], int]:
+    """(listing links, total result pages)"""
+    return _extract_detail_links(html), _page_count(html)
+
+async def _collect_from_one(client: httpx.AsyncClient, url: str, sem: asyncio.Semaphore, attempt: int = 1, max_attempts: int = 3, backoff_ms: int = 400, executor: Optional[Executor] = None, stream: Optional[StreamOptions] = None) -> Set[str]:
+    links, _ = await _collect_page(client, url, sem, attempt, max_attempts, backoff_ms, executor, stream)
+    return links
+
+async def _collect_page(client: httpx.AsyncClient, url: str, sem: asyncio.Semaphore, attempt: int = 1, max_attempts: int = 3, backoff_ms: int = 400, executor: Optional[Executor] = None, stream: Optional[StreamOptions] = None) -> Tuple[Set[str], int]:
+    """Listing links and page count of one search page; (set(), 1) if it failed."""
+    while True:
         try:
-            html = await _fetch(client, url)
-            return _extract_detail_links(html)
-        except Exception:
-            if attempt >= max_attempts:
-                return set()
-            await asyncio.sleep((backoff_ms / 1000.0) * (2 ** (attempt - 1)))
-            return await _collect_from_one(client, url, sem, attempt + 1, max_attempts, backoff_ms)
+            async with sem:
+                html = await _fetch(client, url, stream)
+            break
+        except Exception as e:
+            if attempt >= max_attempts or not is_retryable(e):
+                METRICS.inc("pages_failed_total", labels={"kind": "search", "stage": "fetch"})
+                return set(), 1
+            METRICS.inc("pages_retried_total", labels={"kind": "search"})
+            # Wait without holding a slot so healthy URLs keep flowing
+            await asyncio.sleep(retry_delay(attempt, backoff_ms, e))
+            attempt += 1
+    try:
+        links, pages = await run_parser(executor, _parse_search_page, html)
+    except Exception:
+        METRICS.inc("pages_failed_total", labels={"kind": "search", "stage": "parse"})
+        return set(), 1
+    METRICS.inc("listing_links_found_total", len(links))
+    return links, pages
+
+async def crawl_search(
+    client: httpx.AsyncClient,
+    url: str,
+    sem: asyncio.Semaphore,
+    on_links: Callable[[Set[str]], Awaitable[None]],
+    max_attempts: int = 3,
+    backoff_ms: int = 400,
+    executor: Optional[Executor] = None,
+    stream: Optional[StreamOptions] = None,
+    pagination: Optional[Pagination] = None,
+) -> None:
+    """
+    Fetches one search URL and, with `pagination`, the rest of its result
+    pages; `on_links` gets each page's listing links as soon as it is parsed.
+    """
+    if pagination is not None:
+        if url in pagination.requested:
+            return
+        pagination.requested.add(url)
+    links, pages = await _collect_page(client, url, sem, 1, max_attempts, backoff_ms, executor, stream)
+    await on_links(links)
+    # Only a first page fans out; explicitly listed later pages are taken as is
+    if pagination is None or search_page_number(url) != 1:
+        return
+    if pagination.max_pages:
+        pages = min(pages, pagination.max_pages)
+    rest = [u for u in (search_page_url(url, p) for p in range(2, pages + 1)) if u not in pagination.requested]
+    pagination.requested.update(rest)
+    if not rest:
+        return
+    window = len(rest) if pagination.is_new is None else pagination.window
+    for start in range(0, len(rest), window):
+        tasks = [
+            asyncio.create_task(_collect_page(client, u, sem, 1, max_attempts, backoff_ms, executor, stream))
+            for u in rest[start : start + window]
+        ]
+        stale = False
+        for coro in asyncio.as_completed(tasks):
+            page_links, _ = await coro
+            await on_links(page_links)
+            # A failed page comes back empty; it proves nothing about the pages after it
+            if pagination.is_new is not None and page_links and not any(pagination.is_new(link) for link in page_links):
+                stale = True
+        if stale and start + window < len(rest):
+            # Results are newest first: a page of known listings means the rest are known too
+            METRICS.inc("search_pages_skipped_total", len(rest) - start - window)
+            pagination.stopped_early = True
+            return
+
+async def iter_search_results(
+    client: httpx.AsyncClient,
+    search_urls: Iterable[str],
+    concurrency: int = 10,
+    retry_attempts: int = 3,
+    retry_backoff_base_ms: int = 400,
+    executor: Optional[Executor] = None,
+    stream: Optional[StreamOptions] = None,
+    pagination: Optional[Pagination] = None,
+    sem: Optional[asyncio.Semaphore] = None,
+) -> AsyncIterator[Set[str]]:
+    """Yields the listing links of each search page as it completes; `sem` as in `iter_listing_details`."""
+    sem = sem or asyncio.Semaphore(concurrency)
+    results: "asyncio.Queue[Optional[Set[str]]]" = asyncio.Queue()
+
+    async def crawl_all() -> None:
+        try:
+            await asyncio.gather(
+                *(
+                    crawl_search(client, url, sem, results.put, retry_attempts, retry_backoff_base_ms, executor, stream, pagination)
+                    for url in search_urls
+                )
+            )
+        finally:
+            await results.put(None)
+
+    runner = asyncio.create_task(crawl_all())
+    try:
+        while True:
+            links = await results.get()
+            if links is None:
+                break
+            yield links
+        await runner
+    finally:
+        if not runner.done():
+            runner.cancel()
+            await asyncio.gather(runner, return_exceptions=True)
 
 async def collect_search_results(
     client: httpx.AsyncClient,
@@ -46,14 +224,13 @@ async def collect_search_results(
     concurrency: int = 10,
     retry_attempts: int = 3,
     retry_backoff_base_ms: int = 400,
+    executor: Optional[Executor] = None,
+    stream: Optional[StreamOptions] = None,
+    pagination: Optional[Pagination] = None,
 ) -> Set[str]:
-    sem = asyncio.Semaphore(concurrency)
-    tasks = [
-        asyncio.create_task(_collect_from_one(client, url, sem, 1, retry_attempts, retry_backoff_base_ms))
-        for url in search_urls
-    ]
     all_links: Set[str] = set()
-    for coro in asyncio.as_completed(tasks):
-        links = await coro
+    async for links in iter_search_results(
+        client, search_urls, concurrency, retry_attempts, retry_backoff_base_ms, executor, stream, pagination
+    ):
         all_links.update(links)
-    return all_links
\ No newline at end of file
+    return all_links
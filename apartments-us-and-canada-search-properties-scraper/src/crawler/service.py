@@ -0,0 +1,178 @@
+import asyncio
+import json
+import os
+import signal
+import time
+from typing import Any, AsyncGenerator, Callable, Dict, Optional, Set, Tuple
+
+from .metrics import METRICS
+
+# A job body is a small inputs file; anything bigger is refused with 413
+MAX_BODY_BYTES = 16 * 1024 * 1024
+
+# Validated job dict -> its records as output dicts. Raises ValueError for a
+# job it can't run (e.g. unknown fields), before any record is produced.
+StartJob = Callable[[Dict[str, Any]], AsyncGenerator[Dict[str, Any], None]]
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large"}
+
+def parse_job(body: bytes) -> Dict[str, Any]:
+    """
+    A job is the same JSON object as an inputs file: `searchUrls` and/or
+    `listingUrls`, plus an optional `fields` list. Raises ValueError otherwise.
+    """
+    try:
+        job = json.loads(body or b"null")
+    except ValueError as e:
+        raise ValueError(f"invalid JSON: {e}") from None
+    if not isinstance(job, dict):
+        raise ValueError("job must be a JSON object")
+    for key in ("searchUrls", "listingUrls", "fields"):
+        value = job.get(key)
+        if value is not None and not (isinstance(value, list) and all(isinstance(v, str) for v in value)):
+            raise ValueError(f"{key} must be a list of strings")
+    if not (job.get("searchUrls") or job.get("listingUrls")):
+        raise ValueError("job needs searchUrls or listingUrls")
+    return job
+
+async def _read_request(reader: asyncio.StreamReader) -> Tuple[str, str, Dict[str, str], bytes]:
+    request_line = (await reader.readline()).decode("latin-1").split()
+    if len(request_line) < 2:
+        raise ValueError("malformed request line")
+    headers: Dict[str, str] = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    length = int(headers.get("content-length") or 0)
+    if length > MAX_BODY_BYTES:
+        raise OverflowError(length)
+    body = await reader.readexactly(length) if length else b""
+    return request_line[0].upper(), request_line[1].split("?", 1)[0], headers, body
+
+def _head(status: int, content_type: str, extra: str = "") -> bytes:
+    return (
+        f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+        f"Content-Type: {content_type}\r\n{extra}Connection: close\r\n"
+    ).encode("latin-1")
+
+async def _respond(writer: asyncio.StreamWriter, status: int, payload: Any, content_type: str = "application/json") -> None:
+    body = payload if isinstance(payload, bytes) else (json.dumps(payload) + "\n").encode("utf-8")
+    writer.write(_head(status, content_type) + f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+
+class CrawlService:
+    """
+    Local job API for daemon mode. The caller keeps the HTTP client, parse pool
+    and fetch semaphore warm and hands in `start_job`; every job posted here
+    runs on them concurrently.
+
+        POST /jobs      job JSON in, records out as chunked ndjson while they complete
+        GET  /health    {"ok": true, "jobs_running": .., "jobs_total": ..}
+        GET  /metrics   Prometheus text (same data as metrics.prometheus_port)
+
+    A job that fails mid-stream ends with an `{"_error": ..}` line; a client
+    that disconnects cancels its job.
+    """
+
+    def __init__(self, start_job: StartJob):
+        self.start_job = start_job
+        self.jobs_total = 0
+        self.jobs_running = 0
+        self._handlers: Set[asyncio.Task] = set()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        task = asyncio.current_task()
+        self._handlers.add(task)
+        try:
+            try:
+                method, path, _, body = await _read_request(reader)
+            except OverflowError:
+                await _respond(writer, 413, {"error": f"body over {MAX_BODY_BYTES} bytes"})
+                return
+            except (ValueError, asyncio.IncompleteReadError) as e:
+                await _respond(writer, 400, {"error": str(e)})
+                return
+            if path == "/jobs":
+                if method != "POST":
+                    await _respond(writer, 405, {"error": "POST a job to /jobs"})
+                    return
+                await self._run_job(writer, body)
+            elif path == "/health" and method == "GET":
+                await _respond(writer, 200, {"ok": True, "jobs_running": self.jobs_running, "jobs_total": self.jobs_total})
+            elif path == "/metrics" and method == "GET":
+                await _respond(writer, 200, METRICS.to_prometheus().encode("utf-8"), "text/plain; version=0.0.4")
+            else:
+                await _respond(writer, 404, {"error": f"no route for {method} {path}"})
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self._handlers.discard(task)
+            writer.close()
+
+    async def _run_job(self, writer: asyncio.StreamWriter, body: bytes) -> None:
+        try:
+            records = self.start_job(parse_job(body))
+        except ValueError as e:
+            await _respond(writer, 400, {"error": str(e)})
+            return
+        self.jobs_total += 1
+        job_id = self.jobs_total
+        self.jobs_running += 1
+        METRICS.add_gauge("service_jobs_running", 1)
+        started = time.perf_counter()
+        status = "ok"
+        try:
+            writer.write(_head(200, "application/x-ndjson", f"X-Job-Id: {job_id}\r\n") + b"Transfer-Encoding: chunked\r\n\r\n")
+            try:
+                async for rec in records:
+                    line = (json.dumps(rec, ensure_ascii=False) + "\n").encode("utf-8")
+                    writer.write(b"%x\r\n%s\r\n" % (len(line), line))
+                    await writer.drain()
+            except (ConnectionError, asyncio.CancelledError):
+                status = "cancelled"
+                raise
+            except Exception as e:
+                status = "failed"
+                line = (json.dumps({"_error": f"job failed: {e}"}) + "\n").encode("utf-8")
+                writer.write(b"%x\r\n%s\r\n" % (len(line), line))
+            writer.write(b"0\r\n\r\n")
+            await writer.drain()
+        finally:
+            # stops this job's fetch workers right away instead of at garbage collection
+            await records.aclose()
+            self.jobs_running -= 1
+            METRICS.add_gauge("service_jobs_running", -1)
+            METRICS.inc("service_jobs_total", labels={"status": status})
+            METRICS.observe("service_job_seconds", time.perf_counter() - started)
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 8790, unix_socket: Optional[str] = None) -> None:
+        """Serves on `unix_socket` if set, else on host:port, until SIGINT/SIGTERM; running jobs are then cancelled."""
+        if unix_socket:
+            if os.path.exists(unix_socket):
+                os.remove(unix_socket)
+            server = await asyncio.start_unix_server(self._handle, unix_socket)
+            where = unix_socket
+        else:
+            server = await asyncio.start_server(self._handle, host, port)
+            where = f"http://{host}:{port}"
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        print(f"Crawl service listening on {where}", flush=True)
+        try:
+            await stop.wait()
+        finally:
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                loop.remove_signal_handler(sig)
+            server.close()
+            for task in list(self._handlers):
+                task.cancel()
+            await asyncio.gather(*self._handlers, return_exceptions=True)
+            await server.wait_closed()
+            if unix_socket and os.path.exists(unix_socket):
+                os.remove(unix_socket)
+        print(f"Crawl service stopped after {self.jobs_total} jobs", flush=True)
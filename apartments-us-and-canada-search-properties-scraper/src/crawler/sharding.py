@@ -0,0 +1,29 @@
+from pathlib import Path
+from typing import Callable, Tuple
+
+from .frontier import fingerprint64, listing_key
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """'i/N' -> (i, N) with 0 <= i < N."""
+    try:
+        i, n = (int(x) for x in spec.split("/", 1))
+    except ValueError:
+        raise ValueError(f"shard must look like i/N, got {spec!r}")
+    if n < 1 or not 0 <= i < n:
+        raise ValueError(f"shard index out of range: {spec!r}")
+    return i, n
+
+def shard_of(url: str, count: int) -> int:
+    # keyed like the frontier, so every spelling of a listing lands on one shard
+    return fingerprint64(listing_key(url)) % count
+
+def shard_filter(index: int, count: int) -> Callable[[str], bool]:
+    return lambda url: shard_of(url, count) == index
+
+def shard_path(path: str, index: int, count: int) -> str:
+    """data/crawl_journal.sqlite -> data/crawl_journal.shard0of4.sqlite"""
+    p = Path(path)
+    name = p.name
+    stem = name.split(".", 1)[0]
+    rest = name[len(stem):]
+    return str(p.with_name(f"{stem}.shard{index}of{count}{rest}"))
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+def content_fingerprint(body: bytes) -> str:
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+def record_fingerprint(rec: Dict[str, Any]) -> str:
+    """Fingerprint of the normalized record, ignoring private `_` keys."""
+    public = {k: v for k, v in rec.items() if not k.startswith("_")}
+    return content_fingerprint(json.dumps(public, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+
+def diff_records(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Per-field changes between two records as {field: {"old": ..., "new": ...}}."""
+    out: Dict[str, Dict[str, Any]] = {}
+    for k in sorted(set(old) | set(new)):
+        if k.startswith("_"):
+            continue
+        if old.get(k) != new.get(k):
+            out[k] = {"old": old.get(k), "new": new.get(k)}
+    return out
+
+class SnapshotStore:
+    """
+    Previous-run snapshot for incremental crawls: per listing URL, the fingerprint
+    of the fetched HTML, the fingerprint of the parsed record and the record itself.
+    Each `begin_run` bumps a run counter; listings not seen again are reported removed.
+    """
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS listings (
+                url TEXT PRIMARY KEY,
+                listing_id TEXT,
+                html_fp TEXT,
+                record_fp TEXT,
+                data TEXT NOT NULL,
+                seen_run INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            """
+        )
+        self.conn.commit()
+        self.run = 0
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "SnapshotStore":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def begin_run(self, resume: bool = False) -> int:
+        """
+        Starts a new run, or with `resume` continues the last one: listings the
+        interrupted run already marked seen keep counting, so they are not
+        reported removed (the journal skips them, so they won't be seen again).
+        """
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'run'").fetchone()
+        last = int(row[0]) if row else 0
+        if resume and last:
+            self.run = last
+            return self.run
+        self.run = last + 1
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('run', ?)", (str(self.run),))
+        self.conn.commit()
+        return self.run
+
+    def html_fingerprints(self) -> Dict[str, str]:
+        return {url: fp for url, fp in self.conn.execute("SELECT url, html_fp FROM listings") if fp}
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        row = self.conn.execute("SELECT data FROM listings WHERE url = ?", (url,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_record_fp(self, url: str) -> Optional[str]:
+        row = self.conn.execute("SELECT record_fp FROM listings WHERE url = ?", (url,)).fetchone()
+        return row[0] if row else None
+
+    def mark_seen(self, url: str) -> None:
+        self.conn.execute("UPDATE listings SET seen_run = ? WHERE url = ?", (self.run, url))
+        self.conn.commit()
+
+    def put(self, rec: Dict[str, Any], html_fp: Optional[str], record_fp: str) -> None:
+        public = {k: v for k, v in rec.items() if not k.startswith("_")}
+        self.conn.execute(
+            "INSERT OR REPLACE INTO listings (url, listing_id, html_fp, record_fp, data, seen_run) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (rec["url"], rec.get("listingId"), html_fp, record_fp, json.dumps(public, ensure_ascii=False), self.run),
+        )
+        self.conn.commit()
+
+    def pop_removed(self) -> Iterator[Dict[str, Any]]:
+        """Yields and deletes listings that were not seen during the current run."""
+        rows = self.conn.execute("SELECT url, data FROM listings WHERE seen_run < ?", (self.run,)).fetchall()
+        for url, data in rows:
+            yield json.loads(data)
+            self.conn.execute("DELETE FROM listings WHERE url = ?", (url,))
+        self.conn.commit()
+
+class IncrementalTracker:
+    """
+    Turns crawl records into change records against the stored snapshot: new
+    listings get `_change: "added"`, modified ones `_change: "changed"` plus a
+    `_diff`, unchanged ones are dropped. `removed()` reports listings not seen.
+    """
+
+    def __init__(self, store: SnapshotStore):
+        self.store = store
+
+    def apply(self, rec: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        url = rec.get("url")
+        if not url:
+            return rec
+        if rec.get("_error"):
+            # a failed fetch is not evidence the listing is gone
+            self.store.mark_seen(url)
+            return rec
+        if rec.get("_unchanged"):
+            self.store.mark_seen(url)
+            return None
+
+        record_fp = record_fingerprint(rec)
+        html_fp = rec.pop("_fingerprint", None)
+        prev_fp = self.store.get_record_fp(url)
+        if prev_fp == record_fp:
+            # HTML moved but nothing we extract did; remember the new HTML fingerprint
+            self.store.put(rec, html_fp, record_fp)
+            return None
+
+        prev = self.store.get(url) if prev_fp is not None else None
+        self.store.put(rec, html_fp, record_fp)
+        if prev is None:
+            return {**rec, "_change": "added"}
+        return {**rec, "_change": "changed", "_diff": diff_records(prev, rec)}
+
+    def removed(self) -> Iterator[Dict[str, Any]]:
+        for rec in self.store.pop_removed():
+            yield {**rec, "_change": "removed"}
@@ -0,0 +1,85 @@
+from typing import Collection, List, Optional
+
+import httpx
+from lxml import etree
+
+from .metrics import METRICS
+
+class StreamOptions:
+    """
+    How a page body is read: at most `max_bytes` (0 = no cap), and, when
+    `stop_after` names elements, only until the first of them has been closed.
+    """
+
+    def __init__(self, max_bytes: int = 0, stop_after: Optional[Collection[str]] = None):
+        self.max_bytes = max_bytes
+        self.stop_after = frozenset(stop_after or ())
+
+class StreamedPage:
+    """The parts of `httpx.Response` the collectors use, for a body read by `stream_page`."""
+
+    def __init__(self, response: httpx.Response, content: bytes, truncated: bool, stopped_early: bool):
+        self.response = response
+        self.url = response.url
+        self.status_code = response.status_code
+        self.headers = response.headers
+        self.content = content
+        # bytes read off the connection (still compressed), as on httpx.Response
+        self.num_bytes_downloaded = response.num_bytes_downloaded
+        self.truncated = truncated
+        self.stopped_early = stopped_early
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.response.encoding or "utf-8", errors="replace")
+
+    def raise_for_status(self) -> None:
+        self.response.raise_for_status()
+
+class _EndTagWatcher:
+    """Feeds chunks to an incremental lxml parser and reports when a watched element closes."""
+
+    def __init__(self, tags: Collection[str]):
+        self.parser = etree.HTMLPullParser(events=("end",), tag=tuple(tags))
+
+    def feed(self, chunk: bytes) -> bool:
+        self.parser.feed(chunk)
+        for _ in self.parser.read_events():
+            return True
+        return False
+
+async def stream_page(client: httpx.AsyncClient, url: str, options: StreamOptions) -> StreamedPage:
+    """
+    GET `url` reading the body chunk by chunk. Error responses are returned
+    without reading their body. Reading stops at the byte cap (the page is marked
+    truncated) or once a `stop_after` element has ended; the connection is then
+    dropped instead of draining the rest.
+    """
+    async with client.stream("GET", url, follow_redirects=True) as r:
+        if r.is_error:
+            return StreamedPage(r, b"", False, False)
+        watcher = _EndTagWatcher(options.stop_after) if options.stop_after else None
+        chunks: List[bytes] = []
+        size = 0
+        truncated = stopped_early = False
+        async for chunk in r.aiter_bytes():
+            if options.max_bytes and size + len(chunk) > options.max_bytes:
+                chunks.append(chunk[: options.max_bytes - size])
+                truncated = True
+                break
+            chunks.append(chunk)
+            size += len(chunk)
+            if watcher is not None and watcher.feed(chunk):
+                stopped_early = True
+                break
+        if truncated:
+            METRICS.inc("pages_truncated_total")
+        if stopped_early:
+            METRICS.inc("pages_stopped_early_total")
+        return StreamedPage(r, b"".join(chunks), truncated, stopped_early)
+
+async def get_page(client: httpx.AsyncClient, url: str, stream: Optional[StreamOptions] = None):
+    """Plain buffered GET, or `stream_page` when stream options are given."""
+    if stream is None:
+        return await client.get(url, follow_redirects=True)
+    return await stream_page(client, url, stream)
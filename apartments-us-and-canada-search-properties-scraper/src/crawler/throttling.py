@@ -1,18 +1,173 @@
+import asyncio
+import time
 from contextlib import asynccontextmanager
-from typing import Any, Dict, Optional
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional, Tuple
 
 import httpx
 
+from .http_cache import CachingTransport, ResponseCache
+from .proxy_pool import ProxyPoolTransport, parse_proxy_list
+
+# Statuses that mean "slow down" rather than "this page is broken"
+THROTTLE_STATUSES = {403, 429, 503}
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date)."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class _LimitState:
+    def __init__(self, initial: float):
+        self.limit = initial
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.last_decrease = 0.0
+        self.latency_ewma: Optional[float] = None
+        self.ok = 0
+        self.throttled = 0
+        self.cond = asyncio.Condition()
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit per (host, proxy). Each success grows the window by
+    1/limit (about +1 per round trip); a throttle response (403/429/503) or a
+    latency spike above `latency_factor` x the running average cuts it by
+    `decrease`, at most once per round trip so a burst of 429s counts as one
+    signal. Retry-After pauses the key until the server says to come back.
+    """
+
+    def __init__(
+        self,
+        initial: float = 4,
+        minimum: float = 1,
+        maximum: float = 64,
+        decrease: float = 0.5,
+        latency_factor: float = 3.0,
+    ):
+        self.initial = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease = decrease
+        self.latency_factor = latency_factor
+        self._states: Dict[Tuple[str, str], _LimitState] = {}
+
+    def _state(self, key: Tuple[str, str]) -> _LimitState:
+        st = self._states.get(key)
+        if st is None:
+            st = self._states[key] = _LimitState(self.initial)
+        return st
+
+    async def acquire(self, key: Tuple[str, str]) -> None:
+        st = self._state(key)
+        async with st.cond:
+            while True:
+                wait = st.paused_until - time.monotonic()
+                if wait > 0:
+                    try:
+                        await asyncio.wait_for(st.cond.wait(), wait)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+                if st.in_flight < max(1, int(st.limit)):
+                    st.in_flight += 1
+                    return
+                await st.cond.wait()
+
+    async def release(
+        self,
+        key: Tuple[str, str],
+        status: Optional[int],
+        latency: float,
+        retry_after: Optional[float] = None,
+    ) -> None:
+        st = self._state(key)
+        async with st.cond:
+            st.in_flight -= 1
+            spike = st.latency_ewma is not None and latency > st.latency_ewma * self.latency_factor
+            if status is None or status in THROTTLE_STATUSES or spike:
+                if status in THROTTLE_STATUSES:
+                    st.throttled += 1
+                now = time.monotonic()
+                if now - st.last_decrease >= (st.latency_ewma or 1.0):
+                    st.limit = max(self.minimum, st.limit * self.decrease)
+                    st.last_decrease = now
+                if retry_after:
+                    st.paused_until = max(st.paused_until, time.monotonic() + retry_after)
+            else:
+                st.ok += 1
+                st.limit = min(self.maximum, st.limit + 1.0 / st.limit)
+            if not spike:
+                st.latency_ewma = latency if st.latency_ewma is None else 0.8 * st.latency_ewma + 0.2 * latency
+            st.cond.notify_all()
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Current limit, in-flight count and estimated requests/sec per host/proxy."""
+        out: Dict[str, Dict[str, Any]] = {}
+        now = time.monotonic()
+        for (host, proxy), st in self._states.items():
+            rate = st.limit / st.latency_ewma if st.latency_ewma else None
+            out[f"{host} via {proxy}"] = {
+                "limit": round(st.limit, 2),
+                "in_flight": st.in_flight,
+                "est_rps": round(rate, 2) if rate else None,
+                "latency_ms": round(st.latency_ewma * 1000, 1) if st.latency_ewma else None,
+                "ok": st.ok,
+                "throttled": st.throttled,
+                "paused_secs": round(max(0.0, st.paused_until - now), 1),
+            }
+        return out
+
+class RateLimitedTransport(httpx.AsyncBaseTransport):
+    """Wraps a transport so every request goes through an `AdaptiveLimiter` slot."""
+
+    def __init__(self, inner: httpx.AsyncBaseTransport, limiter: AdaptiveLimiter, proxy_label: str = "direct"):
+        self.inner = inner
+        self.limiter = limiter
+        self.proxy_label = proxy_label
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        key = (request.url.host, self.proxy_label)
+        await self.limiter.acquire(key)
+        started = time.monotonic()
+        status: Optional[int] = None
+        retry_after = None
+        try:
+            response = await self.inner.handle_async_request(request)
+            status = response.status_code
+            retry_after = parse_retry_after(response.headers.get("retry-after"))
+            return response
+        finally:
+            await self.limiter.release(key, status, time.monotonic() - started, retry_after)
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
 @asynccontextmanager
 async def make_http_client(
     headers: Dict[str, str],
     timeout: float,
     max_connections: int,
-    proxies: Optional[Dict[str, Optional[str]]] = None,
+    proxies: Optional[Dict[str, Any]] = None,
+    cache: Optional[ResponseCache] = None,
+    cache_offline: bool = False,
+    limiter: Optional[AdaptiveLimiter] = None,
 ):
+    """
+    The crawl's AsyncClient. Its `proxy_pool` attribute is the ProxyPoolTransport
+    when proxies.json lists several proxies (for its health snapshot), else None.
+    """
     limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+    pool_proxies = parse_proxy_list(proxies)
     proxy = None
-    if proxies:
+    if proxies and not pool_proxies:
         # httpx expects a single proxy mapping or str; we pass mapping if provided
         proxy = {}
         if proxies.get("http"):
@@ -22,11 +177,38 @@ async def make_http_client(
         if not proxy:
             proxy = None
 
-    async with httpx.AsyncClient(
-        headers=headers,
-        timeout=timeout,
-        limits=limits,
-        proxies=proxy,
-        http2=False,  # safer for some proxy setups
-    ) as client:
-        yield client
\ No newline at end of file
+    if cache is None and limiter is None and not pool_proxies:
+        async with httpx.AsyncClient(
+            headers=headers,
+            timeout=timeout,
+            limits=limits,
+            proxies=proxy,
+            http2=False,  # safer for some proxy setups
+        ) as client:
+            client.proxy_pool = None
+            yield client
+        return
+
+    def with_limiter(transport: httpx.AsyncBaseTransport, label: str) -> httpx.AsyncBaseTransport:
+        return RateLimitedTransport(transport, limiter, proxy_label=label) if limiter is not None else transport
+
+    # Proxy mounts would bypass a client-level transport, so each scheme gets its
+    # own stack: cache (hits never touch the limiter) -> [proxy pool] -> limiter -> connection pool
+    mounts: Dict[str, httpx.AsyncBaseTransport] = {}
+    pool: Optional[ProxyPoolTransport] = None
+    if pool_proxies:
+        # one pool shared by both schemes; every proxy keeps its own connections
+        pool = ProxyPoolTransport(pool_proxies, limits, wrap=with_limiter)
+    for scheme in ("http://", "https://"):
+        if pool is not None:
+            transport: httpx.AsyncBaseTransport = pool
+        else:
+            proxy_url = (proxy or {}).get(scheme)
+            transport = httpx.AsyncHTTPTransport(limits=limits, http2=False, proxy=proxy_url)
+            transport = with_limiter(transport, proxy_url or "direct")
+        if cache is not None:
+            transport = CachingTransport(transport, cache, offline=cache_offline)
+        mounts[scheme] = transport
+    async with httpx.AsyncClient(headers=headers, timeout=timeout, mounts=mounts) as client:
+        client.proxy_pool = pool
+        yield client
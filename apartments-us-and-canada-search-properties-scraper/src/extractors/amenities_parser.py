@@ -1,30 +1,63 @@
-from typing import List, Dict
-from bs4 import BeautifulSoup
+from typing import List, Dict, Optional
+from bs4 import BeautifulSoup, Tag
+
+CONTAINER_TAGS = {"section", "div"}
+HEADING_TAGS = {"h2", "h3"}
 
 def parse_amenities(soup: BeautifulSoup) -> List[Dict]:
     """
     Attempts to parse amenities grouped by headings.
     Returns: [{ "title": "Apartment Features", "value": ["Washer/Dryer", "Air Conditioning"] }, ...]
+
+    Every section/div whose first h2/h3 matches gives one entry with all the
+    list items inside it, so nested containers under the same heading each
+    have their own entry, in document order.
+
+    Walks the tree once. List items are kept in document order, so the items under
+    any section/div are a contiguous slice taken when the walk leaves it; a
+    heading is the first one of exactly the open containers that have none yet.
     """
-    out = []
-    sections = soup.select("section, div")
-    for sec in sections:
-        h = sec.find(["h2", "h3"])
-        if not h:
+    items: List[str] = []
+    # one slot per container in document order: None, its title, then its entry
+    slots: List[Optional[object]] = []
+    # open containers as [has_heading, first item index, slot]; headless ones are always a suffix
+    containers: List[list] = []
+
+    stack: List[tuple] = [(soup, False)]
+    while stack:
+        node, leaving = stack.pop()
+        if leaving:
+            _, first, slot = containers.pop()
+            if slots[slot] is not None:
+                slots[slot] = {"title": slots[slot], "value": items[first:]}
             continue
-        title = h.get_text(" ", strip=True)
-        if not title or "amenit" not in title.lower():
-            # Some pages use titled lists; keep loose match but ensure we capture obvious amenities sections.
+        if not isinstance(node, Tag):
             continue
 
-        values = []
-        for li in sec.find_all("li"):
-            t = li.get_text(" ", strip=True)
+        name = node.name
+        if name in CONTAINER_TAGS:
+            containers.append([False, len(items), len(slots)])
+            slots.append(None)
+            stack.append((node, True))
+        elif name in HEADING_TAGS:
+            title = None
+            for c in reversed(containers):
+                if c[0]:
+                    break
+                c[0] = True
+                if title is None:
+                    title = node.get_text(" ", strip=True)
+                # Some pages use titled lists; keep loose match but ensure we capture obvious amenities sections.
+                if title and "amenit" in title.lower():
+                    slots[c[2]] = title
+        elif name == "li":
+            t = node.get_text(" ", strip=True)
             if t and len(t) < 120:
-                values.append(t)
+                items.append(t)
+
+        stack.extend((child, False) for child in reversed(node.contents))
 
-        if values:
-            out.append({"title": title, "value": sorted(set(values))})
+    out = [{"title": e["title"], "value": sorted(set(e["value"]))} for e in slots if e is not None and e["value"]]
 
     # Fallback: compact amenity pills
     if not out:
@@ -32,4 +65,4 @@ def parse_amenities(soup: BeautifulSoup) -> List[Dict]:
         if pills:
             out.append({"title": "Amenities", "value": sorted(set(pills))})
 
-    return out
\ No newline at end of file
+    return out
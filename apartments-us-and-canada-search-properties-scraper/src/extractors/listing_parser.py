@@ -1,22 +1,120 @@
 import json
 import re
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Sequence, Set, Tuple
 
+import lxml.html
+from lxml import etree
+import ujson as json_fast
 from bs4 import BeautifulSoup
 
+from crawler.metrics import METRICS
+
 from .amenities_parser import parse_amenities
 from .media_parser import parse_media
+from .record import GeoPoint, ListingRecord, Range
+
+# Text patterns are compiled once and all run over the same page text. The rent
+# patterns start at the digits (no optional "$ " prefix) so the regex engine can
+# skip ahead to candidate positions; captured groups are unchanged.
+NUMBER_RE = re.compile(r"([\d,.]+)")
+PHONE_RE = re.compile(r"\(?\d{3}\)?[-\s]?\d{3}[-\s]?\d{4}")
+RENT_RANGE_RE = re.compile(r"([\d,]+)\s*[–-]\s*\$?\s*([\d,]+)\s*(?:/mo|per month|monthly)?", re.I)
+RENT_SINGLE_RE = re.compile(r"([\d,]+)\s*(?:/mo|per month|monthly)", re.I)
+# "2 Beds", "1 - 4 Beds", "Studio - 3 Beds"; the low end is group 1, the high end (if any) group 2
+BEDS_RE = re.compile(r"(?<![\d.,])(studio|\d+(?:\.\d+)?)(?:\s*[–-]\s*(\d+(?:\.\d+)?))?\s*beds?\b", re.I)
+BATHS_RE = re.compile(r"(?<![\d.,])(\d+(?:\.\d+)?)(?:\s*[–-]\s*(\d+(?:\.\d+)?))?\s*baths?\b", re.I)
+SQFT_RE = re.compile(r"([\d,]+)\s*(?:sq\.?\s*ft|square\s*feet)", re.I)
+LISTING_ID_RE = re.compile(r"/([a-z0-9]{3,8})/?$")
+# <script type="...ld+json..."> bodies straight from the raw HTML (script content is not entity-decoded)
+JSON_LD_SCRIPT_RE = re.compile(r"""<script\b[^>]*?\stype\s*=\s*["']?[^"'>]*ld\+json[^>]*>(.*?)</script\s*>""", re.I | re.S)
+
+# Extractors each output field depends on. Fields mapped to () are either derived
+# from the URL or not extracted yet (always their default value).
+FIELD_EXTRACTORS: Dict[str, Tuple[str, ...]] = {
+    "url": (),
+    "fullAddress": ("address",),
+    "monthlyRent": ("rent",),
+    "bedrooms": ("beds_baths",),
+    "bathrooms": ("beds_baths",),
+    "squareFeet": ("square_feet",),
+    "propertyInformation": (),
+    "scores": (),
+    "fees": (),
+    "petFees": (),
+    "parkingFees": (),
+    "amenities": ("amenities",),
+    "models": (),
+    "listingId": (),
+    "phoneNumber": ("phone",),
+    "listingCity": ("address",),
+    "listingState": ("address",),
+    "listingZip": ("address",),
+    "listingCountry": ("address",),
+    "listingNeighborhood": (),
+    "listingCounty": (),
+    "listingDMA": (),
+    "listingMinRent": ("rent",),
+    "listingMaxRent": ("rent",),
+    "location": ("json_ld",),
+    "rentals": ("rentals",),
+    "carouselCollection": ("media",),
+    "imageCount": ("media",),
+    "photoCount": ("media",),
+    "videoCount": ("media",),
+    "has3DTour": ("media",),
+    "hasVideo": ("media",),
+    "virtualTourCount": ("media",),
+    "profileType": (),
+    "propertyType": ("json_ld",),
+}
+ALL_EXTRACTORS: FrozenSet[str] = frozenset(e for deps in FIELD_EXTRACTORS.values() for e in deps)
+# Extractors that read the page's flattened text
+TEXT_EXTRACTORS = frozenset({"phone", "rent", "beds_baths", "square_feet"})
+# Extractors the raw JSON-LD pre-parse can satisfy with no DOM at all (address
+# only when the JSON-LD has one; otherwise it needs the <h1> fallback)
+JSON_LD_EXTRACTORS = frozenset({"json_ld", "address"})
+# Extractors `_page_text_light` plus the JSON-LD pre-parse can feed without BeautifulSoup
+LIGHT_EXTRACTORS = frozenset({"json_ld", "rent", "beds_baths", "square_feet"})
+# Elements whose strings BeautifulSoup's get_text() leaves out
+NON_TEXT_TAGS = frozenset({"script", "style", "template"})
+# Always kept so records can still be keyed, deduped and diffed
+KEY_FIELDS = ("url", "listingId")
+
+def resolve_fields(fields: Optional[Iterable[str]]) -> Optional[Tuple[str, ...]]:
+    """
+    Validates a field projection and returns it in schema order with the key
+    fields added. None or an empty list means every field.
+    """
+    if not fields:
+        return None
+    wanted = {f.strip() for f in fields if f.strip()}
+    unknown = sorted(wanted - set(FIELD_EXTRACTORS))
+    if unknown:
+        raise ValueError(f"unknown fields: {', '.join(unknown)}")
+    wanted.update(KEY_FIELDS)
+    return tuple(f for f in FIELD_EXTRACTORS if f in wanted)
+
+def extractors_for(fields: Optional[Sequence[str]]) -> FrozenSet[str]:
+    if fields is None:
+        return ALL_EXTRACTORS
+    needed: Set[str] = set()
+    for f in fields:
+        needed.update(FIELD_EXTRACTORS[f])
+    return frozenset(needed)
 
-def _parse_json_ld(soup: BeautifulSoup) -> Dict[str, Any]:
+def _merge_json_ld(blocks: Iterable[str]) -> Dict[str, Any]:
     out: Dict[str, Any] = {}
-    for script in soup.find_all("script", type=lambda t: t and "ld+json" in t):
-        text = script.string or script.get_text()
-        if not text:
+    for text in blocks:
+        if not text or not text.strip():
             continue
         try:
-            data = json.loads(text)
+            data = json_fast.loads(text)
         except Exception:
-            continue
+            try:
+                # stdlib is more lenient with a few edge cases
+                data = json.loads(text)
+            except Exception:
+                continue
 
         def step(obj):
             nonlocal out
@@ -32,6 +130,41 @@ def _parse_json_ld(soup: BeautifulSoup) -> Dict[str, Any]:
         step(data)
     return out
 
+def _parse_json_ld(html: str) -> Dict[str, Any]:
+    """Merged JSON-LD objects from the raw page, without building any DOM."""
+    if "ld+json" not in html:
+        return {}
+    return _merge_json_ld(JSON_LD_SCRIPT_RE.findall(html))
+
+def _page_text_light(html: str) -> str:
+    """
+    Same text as `soup.get_text(" ", strip=True)` from a bare lxml tree, at a
+    fraction of the cost of building the BeautifulSoup tree. An element's text
+    comes before its children and its tail after them, as in document order.
+    """
+    root = lxml.html.document_fromstring(html)
+    parts: List[str] = []
+    # open script/style/template elements; nothing inside them is text
+    hidden = 0
+    for event, el in etree.iterwalk(root, events=("start", "end", "comment", "pi")):
+        if event == "start":
+            if el.tag in NON_TEXT_TAGS:
+                hidden += 1
+                continue
+            text = el.text
+        elif event == "end":
+            if el.tag in NON_TEXT_TAGS:
+                hidden -= 1
+            text = el.tail if el is not root else None
+        else:
+            # comments and processing instructions add nothing but their tail
+            text = el.tail
+        if text and not hidden:
+            t = text.strip()
+            if t:
+                parts.append(t)
+    return " ".join(parts)
+
 def _extract_text(soup: BeautifulSoup, selector: str) -> Optional[str]:
     node = soup.select_one(selector)
     if not node:
@@ -41,7 +174,7 @@ def _extract_text(soup: BeautifulSoup, selector: str) -> Optional[str]:
 def _parse_numbers(text: str) -> Optional[float]:
     if not text:
         return None
-    m = re.search(r"([\d,.]+)", text)
+    m = NUMBER_RE.search(text)
     if not m:
         return None
     try:
@@ -49,7 +182,7 @@ def _parse_numbers(text: str) -> Optional[float]:
     except Exception:
         return None
 
-def _parse_address(json_ld: Dict[str, Any], soup: BeautifulSoup) -> Dict[str, Any]:
+def _parse_address(json_ld: Dict[str, Any], soup: Optional[BeautifulSoup]) -> Dict[str, Any]:
     address = {"fullAddress": None, "listingCity": None, "listingState": None, "listingZip": None, "listingCountry": None}
     adr = json_ld.get("address") or {}
     if isinstance(adr, dict):
@@ -65,7 +198,7 @@ def _parse_address(json_ld: Dict[str, Any], soup: BeautifulSoup) -> Dict[str, An
         address["listingZip"] = postal
         address["listingCountry"] = country
 
-    if not address["fullAddress"]:
+    if not address["fullAddress"] and soup is not None:
         # fallback: page title or meta
         title = _extract_text(soup, "h1, h1 span")
         meta = _extract_text(soup, 'meta[property="og:title"]')
@@ -73,130 +206,50 @@ def _parse_address(json_ld: Dict[str, Any], soup: BeautifulSoup) -> Dict[str, An
 
     return address
 
-def _parse_geo(json_ld: Dict[str, Any]) -> Dict[str, Any]:
-    loc = {"location": {"latitude": None, "longitude": None}}
+def _parse_geo(json_ld: Dict[str, Any]) -> GeoPoint:
     geo = json_ld.get("geo")
     if isinstance(geo, dict):
         lat = geo.get("latitude")
         lon = geo.get("longitude")
         try:
-            loc["location"]["latitude"] = float(lat) if lat is not None else None
-            loc["location"]["longitude"] = float(lon) if lon is not None else None
+            return GeoPoint(float(lat) if lat is not None else None, float(lon) if lon is not None else None)
         except Exception:
             pass
-    return loc
+    return GeoPoint()
 
-def _guess_rent_ranges(soup: BeautifulSoup) -> Dict[str, Any]:
-    text = soup.get_text(" ", strip=True)
+def _guess_rent_range(text: str) -> Range:
     # Common patterns like "$1,250–$1,600"
-    min_rent, max_rent = None, None
-    m = re.search(r"\$?\s*([\d,]+)\s*[–-]\s*\$?\s*([\d,]+)\s*(?:/mo|per month|monthly)?", text, re.I)
-    if m:
-        min_rent = float(m.group(1).replace(",", ""))
-        max_rent = float(m.group(2).replace(",", ""))
-    else:
-        m = re.search(r"\$?\s*([\d,]+)\s*(?:/mo|per month|monthly)", text, re.I)
-        if m:
-            min_rent = max_rent = float(m.group(1).replace(",", ""))
-
-    return {"monthlyRent": {"min": min_rent, "max": max_rent}, "listingMinRent": min_rent, "listingMaxRent": max_rent}
-
-def _guess_beds_baths(soup: BeautifulSoup) -> Dict[str, Any]:
-    text = soup.get_text(" ", strip=True)
-    beds = None
-    baths = None
-    m = re.search(r"(\d+(?:\.\d+)?)\s*beds?", text, re.I)
+    m = RENT_RANGE_RE.search(text)
     if m:
-        beds = float(m.group(1))
-    m = re.search(r"(\d+(?:\.\d+)?)\s*baths?", text, re.I)
+        return Range(float(m.group(1).replace(",", "")), float(m.group(2).replace(",", "")))
+    m = RENT_SINGLE_RE.search(text)
     if m:
-        baths = float(m.group(1))
-    return {"bedrooms": {"min": beds, "max": beds}, "bathrooms": {"min": baths, "max": baths}}
-
-def normalize_record(record: Dict[str, Any]) -> Dict[str, Any]:
-    # Ensure all top-level fields exist for stable schema
-    defaults = {
-        "url": record.get("url"),
-        "fullAddress": None,
-        "monthlyRent": {"min": None, "max": None},
-        "bedrooms": {"min": None, "max": None},
-        "bathrooms": {"min": None, "max": None},
-        "squareFeet": {"min": None, "max": None},
-        "propertyInformation": [],
-        "scores": {"walkScore": None, "transitScore": None, "bikeScore": None, "soundScore": None},
-        "fees": [],
-        "petFees": [],
-        "parkingFees": [],
-        "amenities": [],
-        "models": [],
-        "listingId": None,
-        "phoneNumber": None,
-        "listingCity": None,
-        "listingState": None,
-        "listingZip": None,
-        "listingCountry": None,
-        "listingNeighborhood": None,
-        "listingCounty": None,
-        "listingDMA": None,
-        "listingMinRent": None,
-        "listingMaxRent": None,
-        "location": {"latitude": None, "longitude": None},
-        "rentals": [],
-        "carouselCollection": [],
-        "imageCount": None,
-        "photoCount": None,
-        "videoCount": None,
-        "has3DTour": False,
-        "hasVideo": False,
-        "virtualTourCount": None,
-        "profileType": None,
-        "propertyType": None,
-    }
-    for k, v in defaults.items():
-        record.setdefault(k, v)
-    return record
-
-def parse_listing_page(url: str, html: str) -> Dict[str, Any]:
-    soup = BeautifulSoup(html, "lxml")
-    json_ld = _parse_json_ld(soup)
-
-    out: Dict[str, Any] = {"url": url}
+        rent = float(m.group(1).replace(",", ""))
+        return Range(rent, rent)
+    return Range()
 
-    # Address & geo
-    out.update(_parse_address(json_ld, soup))
-    out.update(_parse_geo(json_ld))
+def _count_range(m: Optional["re.Match[str]"]) -> Range:
+    if not m:
+        return Range()
+    low = 0.0 if m.group(1).lower() == "studio" else float(m.group(1))
+    high = float(m.group(2)) if m.group(2) else low
+    return Range(low, high)
 
-    # Title/type/phone
-    out["propertyType"] = json_ld.get("@type") if isinstance(json_ld, dict) else None
-    # Phone sometimes embedded as tel: or visible number
-    phone = None
-    for a in soup.select('a[href^="tel:"]'):
-        phone = a.get("href", "").replace("tel:", "").strip()
-        if phone:
-            break
-    if not phone:
-        m = re.search(r"\(?\d{3}\)?[-\s]?\d{3}[-\s]?\d{4}", soup.get_text(" ", strip=True))
-        if m:
-            phone = m.group(0)
-    out["phoneNumber"] = phone
+def _guess_beds_baths(text: str) -> Tuple[Range, Range]:
+    # The first mention is the property summary ("1 - 4 Beds"), ahead of the unit rows
+    return _count_range(BEDS_RE.search(text)), _count_range(BATHS_RE.search(text))
 
-    # Rents/beds/baths/sqft
-    out.update(_guess_rent_ranges(soup))
-    sqft = None
-    m_sq = re.search(r"([\d,]+)\s*(?:sq\.?\s*ft|square\s*feet)", soup.get_text(" ", strip=True), re.I)
-    if m_sq:
-        sqft = float(m_sq.group(1).replace(",", ""))
-    out["squareFeet"] = {"min": sqft, "max": sqft}
+def _guess_square_feet(text: str) -> Range:
+    m = SQFT_RE.search(text)
+    if m:
+        sqft = float(m.group(1).replace(",", ""))
+        return Range(sqft, sqft)
+    return Range()
 
-    # Listing ID
-    m_id = re.search(r"/([a-z0-9]{3,8})/?$", url)
-    out["listingId"] = m_id.group(1) if m_id else None
-
-    # Amenities & media
-    out["amenities"] = parse_amenities(soup)
-    media = parse_media(soup)
-    out.update(media)
+def _timed(extractor: str):
+    return METRICS.timer("extract_seconds", {"extractor": extractor})
 
+def _parse_rentals(soup: BeautifulSoup) -> List[dict]:
     # Rentals (basic heuristic)
     rentals: List[dict] = []
     for row in soup.select("table tr"):
@@ -222,6 +275,96 @@ def parse_listing_page(url: str, html: str) -> Dict[str, Any]:
                 )
             except Exception:
                 continue
-    out["rentals"] = rentals
+    return rentals
+
+def parse_listing_page(url: str, html: str, fields: Optional[Sequence[str]] = None) -> ListingRecord:
+    """
+    Parses one listing page into a `ListingRecord`. With `fields` (see
+    `resolve_fields`) only the extractors those fields need are run and only
+    those keys are exported.
+
+    JSON-LD is always read from the raw HTML first. If it covers the projection
+    no DOM is built ("json_ld" path); text-only projections use a bare lxml tree
+    ("light"); everything else builds the BeautifulSoup tree ("dom"). The path
+    taken is recorded as `_parsePath`.
+    """
+    needed = extractors_for(fields)
+    soup = None
+    json_ld: Dict[str, Any] = {}
+    text = ""
+    rec = ListingRecord(url, fields)
+
+    if needed & JSON_LD_EXTRACTORS:
+        with _timed("json_ld"):
+            json_ld = _parse_json_ld(html)
+    address = _parse_address(json_ld, None) if "address" in needed else None
+
+    if needed <= JSON_LD_EXTRACTORS and (address is None or address["fullAddress"]):
+        path = "json_ld"
+    elif needed <= LIGHT_EXTRACTORS:
+        # e.g. price monitoring: rent/beds/location never need the soup
+        path = "light"
+        with _timed("light"):
+            text = _page_text_light(html)
+    else:
+        path = "dom"
+        with _timed("dom"):
+            soup = BeautifulSoup(html, "lxml")
+        # Page text is produced once and shared by every text-based guess below
+        if needed & TEXT_EXTRACTORS:
+            with _timed("text"):
+                text = soup.get_text(" ", strip=True)
+    METRICS.inc("parse_path_total", labels={"path": path})
+
+    # Address & geo
+    if address is not None:
+        if not address["fullAddress"] and soup is not None:
+            with _timed("address"):
+                address = _parse_address(json_ld, soup)
+        rec.update(address)
+    if "json_ld" in needed:
+        rec.location = _parse_geo(json_ld)
+        rec.propertyType = json_ld.get("@type") if isinstance(json_ld, dict) else None
+
+    # Phone sometimes embedded as tel: or visible number
+    if "phone" in needed:
+        phone = None
+        with _timed("phone"):
+            for a in soup.select('a[href^="tel:"]'):
+                phone = a.get("href", "").replace("tel:", "").strip()
+                if phone:
+                    break
+            if not phone:
+                m = PHONE_RE.search(text)
+                if m:
+                    phone = m.group(0)
+        rec.phoneNumber = phone
+
+    # Rents/beds/baths/sqft
+    with _timed("ranges"):
+        if "rent" in needed:
+            rent = rec.monthlyRent = _guess_rent_range(text)
+            rec.listingMinRent, rec.listingMaxRent = rent
+        if "beds_baths" in needed:
+            rec.bedrooms, rec.bathrooms = _guess_beds_baths(text)
+        if "square_feet" in needed:
+            rec.squareFeet = _guess_square_feet(text)
+
+    # Listing ID
+    m_id = LISTING_ID_RE.search(url)
+    rec.listingId = m_id.group(1) if m_id else None
+
+    # Amenities & media
+    if "amenities" in needed:
+        with _timed("amenities"):
+            rec.amenities = parse_amenities(soup)
+    if "media" in needed:
+        with _timed("media"):
+            rec.update(parse_media(soup))
+
+    if "rentals" in needed:
+        with _timed("rentals"):
+            rec.rentals = _parse_rentals(soup)
 
-    return normalize_record(out)
\ No newline at end of file
+    rec.extras["_parsePath"] = path
+    return rec
@@ -0,0 +1,122 @@
+from typing import Any, Callable, Dict, NamedTuple, Optional, Sequence, Tuple, Union
+
+class Range(NamedTuple):
+    """Rent / beds / baths / square feet span; exported as {"min": .., "max": ..}."""
+
+    min: Optional[float] = None
+    max: Optional[float] = None
+
+class GeoPoint(NamedTuple):
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+
+# Output fields in schema order, each with the value exported when it was never set
+_EMPTY_RANGE: Callable[[], Any] = lambda: {"min": None, "max": None}
+_EMPTY_LIST: Callable[[], Any] = list
+_NONE: Callable[[], Any] = lambda: None
+FIELD_DEFAULTS: Dict[str, Callable[[], Any]] = {
+    "url": _NONE,
+    "fullAddress": _NONE,
+    "monthlyRent": _EMPTY_RANGE,
+    "bedrooms": _EMPTY_RANGE,
+    "bathrooms": _EMPTY_RANGE,
+    "squareFeet": _EMPTY_RANGE,
+    "propertyInformation": _EMPTY_LIST,
+    "scores": lambda: {"walkScore": None, "transitScore": None, "bikeScore": None, "soundScore": None},
+    "fees": _EMPTY_LIST,
+    "petFees": _EMPTY_LIST,
+    "parkingFees": _EMPTY_LIST,
+    "amenities": _EMPTY_LIST,
+    "models": _EMPTY_LIST,
+    "listingId": _NONE,
+    "phoneNumber": _NONE,
+    "listingCity": _NONE,
+    "listingState": _NONE,
+    "listingZip": _NONE,
+    "listingCountry": _NONE,
+    "listingNeighborhood": _NONE,
+    "listingCounty": _NONE,
+    "listingDMA": _NONE,
+    "listingMinRent": _NONE,
+    "listingMaxRent": _NONE,
+    "location": lambda: {"latitude": None, "longitude": None},
+    "rentals": _EMPTY_LIST,
+    "carouselCollection": _EMPTY_LIST,
+    "imageCount": _NONE,
+    "photoCount": _NONE,
+    "videoCount": _NONE,
+    "has3DTour": lambda: False,
+    "hasVideo": lambda: False,
+    "virtualTourCount": _NONE,
+    "profileType": _NONE,
+    "propertyType": _NONE,
+}
+RECORD_FIELDS = tuple(FIELD_DEFAULTS)
+TUPLE_FIELDS = {"monthlyRent": Range, "bedrooms": Range, "bathrooms": Range, "squareFeet": Range, "location": GeoPoint}
+_TUPLE_TYPES = (Range, GeoPoint)
+
+class ListingRecord:
+    """
+    One parsed listing as slots: unset fields take no space, ranges and
+    location are tuples, and private markers (`_parsePath`, `_fingerprint`,
+    ...) sit in a small `extras` dict. `to_dict()` builds the output shape
+    (the dict `normalize_record` used to produce) and is only called when the
+    record is journaled, diffed or exported.
+    """
+
+    __slots__ = RECORD_FIELDS + ("fields", "extras")
+
+    def __init__(self, url: str, fields: Optional[Sequence[str]] = None):
+        self.url = url
+        # projection (see listing_parser.resolve_fields); None = every field
+        self.fields = fields
+        self.extras: Dict[str, Any] = {}
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        # slot values by position (in `fields` order): a parse-pool result pickles without key names
+        values = [getattr(self, name, None) for name in self.fields or RECORD_FIELDS]
+        return _rebuild_record, (self.fields, self.extras, tuple(tuple(v) if type(v) in _TUPLE_TYPES else v for v in values))
+
+    def update(self, values: Dict[str, Any]) -> None:
+        for name, value in values.items():
+            setattr(self, name, value)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Dict-style read: private keys from `extras`, fields as stored (ranges stay tuples)."""
+        if key.startswith("_"):
+            return self.extras.get(key, default)
+        value = getattr(self, key, None) if key in FIELD_DEFAULTS else None
+        return default if value is None else value
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key.startswith("_"):
+            self.extras[key] = value
+        else:
+            setattr(self, key, value)
+
+    def to_dict(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {}
+        for name in self.fields or RECORD_FIELDS:
+            value = getattr(self, name, None)
+            if value is None:
+                value = FIELD_DEFAULTS[name]()
+            elif isinstance(value, tuple):
+                value = value._asdict()
+            out[name] = value
+        out.update(self.extras)
+        return out
+
+def _rebuild_record(fields: Optional[Sequence[str]], extras: Dict[str, Any], values: Tuple[Any, ...]) -> ListingRecord:
+    rec = ListingRecord.__new__(ListingRecord)
+    rec.fields = fields
+    rec.extras = extras
+    for name, value in zip(fields or RECORD_FIELDS, values):
+        if value is not None:
+            # ranges/location travel as plain tuples, which unpickle much faster than NamedTuples
+            tuple_type = TUPLE_FIELDS.get(name)
+            setattr(rec, name, tuple.__new__(tuple_type, value) if tuple_type is not None else value)
+    return rec
+
+def as_dict(rec: Union[ListingRecord, Dict[str, Any]]) -> Dict[str, Any]:
+    """The output dict for a record; error and stub records are plain dicts already."""
+    return rec.to_dict() if isinstance(rec, ListingRecord) else rec
@@ -1,24 +1,44 @@
 import csv
+import gzip
+import io
 import json
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Tuple
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple, Union
 
 from slugify import slugify
 
+from crawler.metrics import METRICS
+from extractors.record import ListingRecord, as_dict
+
+SCHEMA_PATH = Path(__file__).with_name("schema.json")
+FLATTENED_OBJECT_FIELDS = ["monthlyRent", "bedrooms", "bathrooms", "squareFeet", "location"]
+JSON_ARRAY_FIELDS = ["amenities", "fees", "petFees", "parkingFees", "models", "rentals", "carouselCollection"]
+# Private keys kept as CSV/columnar columns (others are dropped); dicts are stored as JSON text
+EXTRA_COLUMNS = {
+    "_error": {"type": "string"},
+    "_change": {"type": "string"},
+    "_parsePath": {"type": "string"},
+    "_truncated": {"type": "boolean"},
+    "_diff": {"type": "string"},
+}
+
 def _flatten_record(rec: Dict[str, Any]) -> Dict[str, Any]:
     """Flatten selected nested fields for CSV export."""
     flat = dict(rec)
     # nested simple objects
-    for field in ["monthlyRent", "bedrooms", "bathrooms", "squareFeet", "location"]:
+    for field in FLATTENED_OBJECT_FIELDS:
         obj = flat.get(field) or {}
         if isinstance(obj, dict):
             for k, v in obj.items():
                 flat[f"{field}.{k}"] = v
     # counts: keep
     # arrays: keep JSON string for CSV
-    for arr_field in ["amenities", "fees", "petFees", "parkingFees", "models", "rentals", "carouselCollection"]:
+    for arr_field in JSON_ARRAY_FIELDS:
         if arr_field in flat and isinstance(flat[arr_field], list):
             flat[arr_field] = json.dumps(flat[arr_field], ensure_ascii=False)
+    # incremental per-field changes
+    if isinstance(flat.get("_diff"), dict):
+        flat["_diff"] = json.dumps(flat["_diff"], ensure_ascii=False)
     return flat
 
 def export_json(records: List[Dict[str, Any]], path: str) -> None:
@@ -31,13 +51,319 @@ def export_csv(records: List[Dict[str, Any]], path: str) -> None:
         return
     flattened = [_flatten_record(r) for r in records]
     # Collect fields across all records
-    fieldnames: List[str] = []
+    # dict keeps first-seen order with O(1) membership checks
+    seen: Dict[str, None] = {}
     for rec in flattened:
         for k in rec.keys():
-            if k not in fieldnames:
-                fieldnames.append(k)
+            seen.setdefault(k, None)
+    fieldnames: List[str] = list(seen)
 
     with open(path, "w", newline="", encoding="utf-8") as f:
         writer = csv.DictWriter(f, fieldnames=fieldnames)
         writer.writeheader()
-        writer.writerows(flattened)
\ No newline at end of file
+        writer.writerows(flattened)
+
+def schema_csv_fieldnames(schema_path: Path = SCHEMA_PATH, fields: Optional[Sequence[str]] = None) -> List[str]:
+    """
+    CSV header taken from schema.json, matching the columns `_flatten_record`
+    produces. With `fields` only those properties (and their subfields) are kept.
+    """
+    with open(schema_path, "r", encoding="utf-8") as f:
+        schema = json.load(f)
+    fieldnames: List[str] = []
+    for name, spec in schema.get("properties", {}).items():
+        if fields is not None and name not in fields:
+            continue
+        fieldnames.append(name)
+        if name in FLATTENED_OBJECT_FIELDS:
+            fieldnames.extend(f"{name}.{k}" for k in spec.get("properties", {}))
+    fieldnames.extend(EXTRA_COLUMNS)
+    return fieldnames
+
+def _open_text(path: str) -> IO[str]:
+    """Opens `path` for writing text, compressing by extension (.gz, or .zst with `zstandard`)."""
+    suffix = Path(path).suffix.lower()
+    if suffix == ".gz":
+        return gzip.open(path, "wt", encoding="utf-8", newline="")
+    if suffix == ".zst":
+        try:
+            import zstandard
+        except ImportError as e:
+            raise RuntimeError("zstd output requires the `zstandard` package") from e
+        raw = open(path, "wb")
+        return io.TextIOWrapper(zstandard.ZstdCompressor().stream_writer(raw), encoding="utf-8", newline="")
+    return open(path, "w", encoding="utf-8", newline="")
+
+def _open_text_read(path: str) -> IO[str]:
+    suffix = Path(path).suffix.lower()
+    if suffix == ".gz":
+        return gzip.open(path, "rt", encoding="utf-8")
+    if suffix == ".zst":
+        try:
+            import zstandard
+        except ImportError as e:
+            raise RuntimeError("zstd input requires the `zstandard` package") from e
+        return io.TextIOWrapper(zstandard.ZstdDecompressor().stream_reader(open(path, "rb")), encoding="utf-8")
+    return open(path, "r", encoding="utf-8")
+
+def output_format(path: str) -> str:
+    """Format name from the output path, ignoring a trailing compression suffix."""
+    suffixes = [s.lower() for s in Path(path).suffixes]
+    if suffixes and suffixes[-1] in (".gz", ".zst"):
+        suffixes = suffixes[:-1]
+    ext = suffixes[-1] if suffixes else ""
+    if ext in (".ndjson", ".jsonl"):
+        return "ndjson"
+    if ext == ".csv":
+        return "csv"
+    if ext == ".parquet":
+        return "parquet"
+    if ext in (".arrow", ".feather"):
+        return "arrow"
+    return "json"
+
+class RecordWriter:
+    """
+    Writes records one at a time as the crawl yields them, so memory stays at
+    roughly one record regardless of run size. Use as a context manager.
+    """
+
+    def __init__(self, path: str, fields: Optional[Sequence[str]] = None):
+        self.path = path
+        self.fields = fields
+        self.count = 0
+        self._fh: Optional[IO[str]] = None
+        self._metric_labels = {"format": output_format(path)}
+
+    def __enter__(self) -> "RecordWriter":
+        self._fh = _open_text(self.path)
+        self._begin()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        try:
+            self._end()
+        finally:
+            self._fh.close()
+
+    def write(self, rec: Union[Dict[str, Any], ListingRecord]) -> None:
+        with METRICS.timer("export_seconds", self._metric_labels):
+            self._write(as_dict(rec))
+        self.count += 1
+        METRICS.inc("records_written_total")
+
+    def _begin(self) -> None:
+        pass
+
+    def _write(self, rec: Dict[str, Any]) -> None:
+        raise NotImplementedError
+
+    def _end(self) -> None:
+        pass
+
+class NdjsonWriter(RecordWriter):
+    def _write(self, rec: Dict[str, Any]) -> None:
+        self._fh.write(json.dumps(rec, ensure_ascii=False))
+        self._fh.write("\n")
+
+class JsonArrayWriter(RecordWriter):
+    """Same layout as `export_json`, written incrementally."""
+
+    def _begin(self) -> None:
+        self._fh.write("[")
+
+    def _write(self, rec: Dict[str, Any]) -> None:
+        body = json.dumps(rec, ensure_ascii=False, indent=2)
+        self._fh.write(",\n  " if self.count else "\n  ")
+        self._fh.write(body.replace("\n", "\n  "))
+
+    def _end(self) -> None:
+        self._fh.write("\n]" if self.count else "]")
+
+class CsvWriter(RecordWriter):
+    """CSV with a fixed header from schema.json, so records never need to be held for field discovery."""
+
+    def _begin(self) -> None:
+        self._writer = csv.DictWriter(self._fh, fieldnames=schema_csv_fieldnames(fields=self.fields), extrasaction="ignore")
+        self._writer.writeheader()
+
+    def _write(self, rec: Dict[str, Any]) -> None:
+        self._writer.writerow(_flatten_record(rec))
+
+def _import_pyarrow() -> Any:
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise RuntimeError("parquet/arrow output requires the `pyarrow` package") from e
+    return pyarrow
+
+def _arrow_type(pa: Any, spec: Dict[str, Any]) -> Any:
+    """Arrow type for a schema.json property: objects become structs, arrays lists."""
+    kinds = spec.get("type", "string")
+    kind = next((k for k in kinds if k != "null"), "string") if isinstance(kinds, list) else kinds
+    if kind == "object" and spec.get("properties"):
+        return pa.struct([(k, _arrow_type(pa, v)) for k, v in spec["properties"].items()])
+    if kind == "array":
+        # Item shape unknown: one JSON string per element
+        return pa.list_(_arrow_type(pa, spec["items"]) if "items" in spec else pa.string())
+    if kind == "number":
+        return pa.float64()
+    if kind == "integer":
+        return pa.int64()
+    if kind == "boolean":
+        return pa.bool_()
+    return pa.string()
+
+def arrow_schema(schema_path: Path = SCHEMA_PATH, fields: Optional[Sequence[str]] = None) -> Any:
+    """Arrow schema from schema.json (narrowed to `fields`) plus the `EXTRA_COLUMNS`."""
+    pa = _import_pyarrow()
+    with open(schema_path, "r", encoding="utf-8") as f:
+        schema = json.load(f)
+    columns = [
+        pa.field(name, _arrow_type(pa, spec))
+        for name, spec in schema.get("properties", {}).items()
+        if fields is None or name in fields
+    ]
+    columns.extend(pa.field(name, _arrow_type(pa, spec)) for name, spec in EXTRA_COLUMNS.items())
+    return pa.schema(columns)
+
+def _arrow_converter(t: Any, pa: Any) -> Callable[[Any], Any]:
+    """
+    Function coercing a record value into what `pa.array` accepts for type `t`;
+    mismatches become null. Built once per column so the per-record work is
+    just the calls.
+    """
+    if pa.types.is_struct(t):
+        subs = [(f.name, _arrow_converter(f.type, pa)) for f in t]
+        return lambda v: {name: conv(v.get(name)) for name, conv in subs} if isinstance(v, dict) else None
+    if pa.types.is_list(t):
+        item = _arrow_converter(t.value_type, pa)
+        return lambda v: [item(x) for x in v] if isinstance(v, list) else None
+    if pa.types.is_boolean(t):
+        return lambda v: v if isinstance(v, bool) else None
+    if pa.types.is_floating(t) or pa.types.is_integer(t):
+        cast = float if pa.types.is_floating(t) else int
+
+        def number(v: Any) -> Any:
+            if v is None or isinstance(v, bool):
+                return None
+            try:
+                return cast(v)
+            except (TypeError, ValueError):
+                return None
+
+        return number
+
+    def text(v: Any) -> Any:
+        if v is None or isinstance(v, str):
+            return v
+        if isinstance(v, (dict, list)):
+            return json.dumps(v, ensure_ascii=False)
+        return str(v)
+
+    return text
+
+class ColumnarWriter(RecordWriter):
+    """
+    Parquet (.parquet) or Arrow IPC (.arrow/.feather) with the schema from
+    schema.json: ranges and location are structs, amenities/rentals/media are
+    list<struct> columns. Records are buffered per column and flushed every
+    `BATCH_ROWS` rows as one row group / record batch. Needs `pyarrow`.
+    """
+
+    BATCH_ROWS = 10_000
+
+    def __enter__(self) -> "ColumnarWriter":
+        if Path(self.path).suffix.lower() in (".gz", ".zst"):
+            raise ValueError(f"{self._metric_labels['format']} output is compressed internally; drop the suffix: {self.path}")
+        self._pa = _import_pyarrow()
+        self._schema = arrow_schema(fields=self.fields)
+        self._columns: Dict[str, List[Any]] = {f.name: [] for f in self._schema}
+        self._converters = [(f.name, self._columns[f.name].append, _arrow_converter(f.type, self._pa)) for f in self._schema]
+        self._buffered = 0
+        if self._metric_labels["format"] == "parquet":
+            import pyarrow.parquet as pq
+
+            self._out = pq.ParquetWriter(self.path, self._schema, compression="zstd")
+        else:
+            self._out = self._pa.ipc.new_file(self.path, self._schema, options=self._pa.ipc.IpcWriteOptions(compression="zstd"))
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        try:
+            self._flush()
+        finally:
+            self._out.close()
+
+    def _write(self, rec: Dict[str, Any]) -> None:
+        for name, append, convert in self._converters:
+            append(convert(rec.get(name)))
+        self._buffered += 1
+        if self._buffered >= self.BATCH_ROWS:
+            self._flush()
+
+    def _flush(self) -> None:
+        if not self._buffered:
+            return
+        pa = self._pa
+        batch = pa.RecordBatch.from_arrays(
+            [pa.array(self._columns[f.name], type=f.type) for f in self._schema], schema=self._schema
+        )
+        if self._metric_labels["format"] == "parquet":
+            self._out.write_batch(batch, row_group_size=len(batch))
+        else:
+            self._out.write_batch(batch)
+        for values in self._columns.values():
+            values.clear()
+        self._buffered = 0
+
+WRITERS = {
+    "json": JsonArrayWriter,
+    "ndjson": NdjsonWriter,
+    "csv": CsvWriter,
+    "parquet": ColumnarWriter,
+    "arrow": ColumnarWriter,
+}
+
+def open_record_writer(path: str, fields: Optional[Sequence[str]] = None) -> RecordWriter:
+    """Writer for `path`; `fields` narrows the CSV header / columnar schema to a projection (see `resolve_fields`)."""
+    return WRITERS[output_format(path)](path, fields)
+
+def export_stream(records: Iterable[Dict[str, Any]], path: str, fields: Optional[Sequence[str]] = None) -> int:
+    """Streams `records` into `path` (format and compression by extension). Returns the count written."""
+    with open_record_writer(path, fields) as writer:
+        for rec in records:
+            writer.write(rec)
+    return writer.count
+
+def iter_record_file(path: str) -> Iterator[Dict[str, Any]]:
+    """Reads records back from a json or ndjson output (optionally .gz/.zst). CSV and columnar files are not supported."""
+    fmt = output_format(path)
+    if fmt not in ("json", "ndjson"):
+        raise ValueError(f"cannot read records back from {fmt}: {path}")
+    with _open_text_read(path) as f:
+        if fmt == "json":
+            yield from json.load(f)
+            return
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def merge_outputs(parts: Iterable[str], path: str, fields: Optional[Sequence[str]] = None) -> int:
+    """
+    Combines shard outputs into one file (format by extension), keeping the first
+    record seen per listingId (per url for records without one). Returns the count written.
+    """
+    seen: Set[str] = set()
+
+    def unique() -> Iterator[Dict[str, Any]]:
+        for part in parts:
+            for rec in iter_record_file(part):
+                key = rec.get("listingId") or rec.get("url")
+                if key:
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                yield rec
+
+    return export_stream(unique(), path, fields)
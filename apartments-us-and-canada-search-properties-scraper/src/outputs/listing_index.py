@@ -0,0 +1,301 @@
+import json
+import math
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from crawler.frontier import listing_key
+
+# (low, high) filter bounds; None on either side leaves it open
+Bounds = Tuple[Optional[float], Optional[float]]
+
+# Geo grid: cells of CELL_DEG x CELL_DEG degrees (~5.5 km north-south), numbered
+# row-major so the cells of one grid row form a contiguous id range
+CELL_DEG = 0.05
+GRID_COLS = int(360 / CELL_DEG)
+EARTH_RADIUS_KM = 6371.0088
+
+# (column prefix, record field) for the interval-indexed ranges
+RANGE_FIELDS = (("rent", "monthlyRent"), ("beds", "bedrooms"))
+
+INSERT_BATCH = 10_000
+
+def grid_cell(lat: float, lon: float) -> int:
+    row = int(math.floor((lat + 90.0) / CELL_DEG))
+    col = int(math.floor((lon + 180.0) / CELL_DEG)) % GRID_COLS
+    return row * GRID_COLS + col
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    a = math.sin((p2 - p1) / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+def _norm_text(value: Any) -> Optional[str]:
+    return (value.strip().casefold() or None) if isinstance(value, str) else None
+
+def _norm_zip(value: Any) -> Optional[str]:
+    """'27105-1234' -> '27105'; Canadian 'm5v 2t6' -> 'M5V2T6'."""
+    if value is None:
+        return None
+    text = str(value).strip().upper().replace(" ", "")
+    return text.split("-", 1)[0] or None
+
+def _span(value: Any) -> Tuple[Optional[float], Optional[float]]:
+    """A {"min", "max"} range as numbers; a missing side takes the other's value."""
+    if not isinstance(value, dict):
+        return None, None
+    lo, hi = value.get("min"), value.get("max")
+    lo = lo if isinstance(lo, (int, float)) else None
+    hi = hi if isinstance(hi, (int, float)) else None
+    if lo is None:
+        lo = hi
+    if hi is None:
+        hi = lo
+    return lo, hi
+
+def _index_row(rec: Dict[str, Any]) -> Tuple[Any, ...]:
+    loc = rec.get("location") or {}
+    lat, lon = loc.get("latitude"), loc.get("longitude")
+    if not (isinstance(lat, (int, float)) and isinstance(lon, (int, float))):
+        lat = lon = None
+    rent, beds = (_span(rec.get(field)) for _, field in RANGE_FIELDS)
+    public = {k: v for k, v in rec.items() if not k.startswith("_")}
+    return (
+        rec.get("listingId") or listing_key(rec["url"]),
+        _norm_text(rec.get("listingCity")),
+        _norm_text(rec.get("listingState")),
+        _norm_zip(rec.get("listingZip")),
+        *rent,
+        *beds,
+        lat,
+        lon,
+        grid_cell(lat, lon) if lat is not None else None,
+        json.dumps(public, ensure_ascii=False),
+    )
+
+class ListingIndex:
+    """
+    Scraped listings in an SQLite file, indexed for the usual downstream filters
+    so they don't need a scan of the export:
+
+    - city, state, zip: equality lookups on casefolded values
+    - monthlyRent and bedrooms: min and max columns. Overlap with [lo, hi] is
+      min <= hi and max >= lo. The widest range stored is kept in `meta`, so
+      the min index is also bounded below (min >= lo - widest).
+    - location: a row-major grid cell id per listing. A radius query reads one
+      cell-id range per grid row of its bounding box, then keeps listings
+      within the radius (haversine).
+
+    Listings are keyed by listingId (else the URL's listing key), so adding an
+    updated export replaces them. `_change: "removed"` records from incremental
+    runs delete them, and `_error` records are skipped.
+    """
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS listings (
+                id INTEGER PRIMARY KEY,
+                listing_key TEXT NOT NULL UNIQUE,
+                city TEXT,
+                state TEXT,
+                zip TEXT,
+                rent_min REAL,
+                rent_max REAL,
+                beds_min REAL,
+                beds_max REAL,
+                lat REAL,
+                lon REAL,
+                cell INTEGER,
+                data TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value REAL);
+            """
+        )
+        self._create_indexes()
+        self.conn.commit()
+
+    def _create_indexes(self) -> None:
+        # max next to min and lat/lon next to the cell, so overlap and distance
+        # tests are answered from the index without reading the (large) row
+        self.conn.executescript(
+            """
+            CREATE INDEX IF NOT EXISTS listings_city ON listings (city, state);
+            CREATE INDEX IF NOT EXISTS listings_state ON listings (state);
+            CREATE INDEX IF NOT EXISTS listings_zip ON listings (zip);
+            CREATE INDEX IF NOT EXISTS listings_rent ON listings (rent_min, rent_max);
+            CREATE INDEX IF NOT EXISTS listings_beds ON listings (beds_min, beds_max);
+            CREATE INDEX IF NOT EXISTS listings_cell ON listings (cell, lat, lon);
+            """
+        )
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "ListingIndex":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def clear(self) -> None:
+        self.conn.execute("DELETE FROM listings")
+        self.conn.execute("DELETE FROM meta")
+        self.conn.commit()
+
+    def rebuild(self, records: Iterable[Dict[str, Any]]) -> int:
+        """Replaces the contents with `records`; the indexes are built once at the end, which is much faster."""
+        self.clear()
+        # secondary indexes only; sql IS NULL marks SQLite's own (e.g. the UNIQUE key)
+        indexes = self.conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'listings' AND sql IS NOT NULL"
+        ).fetchall()
+        for (name,) in indexes:
+            self.conn.execute(f"DROP INDEX {name}")
+        try:
+            return self.add(records)
+        finally:
+            self._create_indexes()
+            self._analyze()
+
+    def _analyze(self) -> None:
+        # sampled statistics, so the planner knows e.g. state is less selective than zip
+        self.conn.execute("PRAGMA analysis_limit=1000")
+        self.conn.execute("ANALYZE")
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM listings").fetchone()[0]
+
+    def _widest(self, prefix: str) -> float:
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (f"{prefix}_width",)).fetchone()
+        return row[0] if row else 0.0
+
+    def add(self, records: Iterable[Dict[str, Any]]) -> int:
+        """Inserts or replaces listings in batches of INSERT_BATCH; returns how many were stored."""
+        widths = {prefix: self._widest(prefix) for prefix, _ in RANGE_FIELDS}
+        added = 0
+        rows: List[Tuple[Any, ...]] = []
+
+        def flush() -> None:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO listings (listing_key, city, state, zip, rent_min, rent_max, beds_min, "
+                "beds_max, lat, lon, cell, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            rows.clear()
+
+        with self.conn:
+            for rec in records:
+                if rec.get("_error") or not rec.get("url"):
+                    continue
+                if rec.get("_change") == "removed":
+                    # rare; flushing first keeps add/remove order within the batch
+                    flush()
+                    self.conn.execute(
+                        "DELETE FROM listings WHERE listing_key = ?", (rec.get("listingId") or listing_key(rec["url"]),)
+                    )
+                    continue
+                row = _index_row(rec)
+                for i, (prefix, _) in enumerate(RANGE_FIELDS):
+                    lo, hi = row[4 + 2 * i], row[5 + 2 * i]
+                    if lo is not None and hi - lo > widths[prefix]:
+                        widths[prefix] = hi - lo
+                rows.append(row)
+                added += 1
+                if len(rows) >= INSERT_BATCH:
+                    flush()
+            flush()
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                [(f"{prefix}_width", width) for prefix, width in widths.items()],
+            )
+        self._analyze()
+        return added
+
+    def _range_clause(self, prefix: str, bounds: Bounds, where: List[str], params: List[Any]) -> None:
+        lo, hi = bounds
+        if hi is not None:
+            where.append(f"{prefix}_min <= ?")
+            params.append(hi)
+        if lo is not None:
+            where.append(f"{prefix}_max >= ?")
+            params.append(lo)
+            # lets the min index bound the scan from below too
+            where.append(f"{prefix}_min >= ?")
+            params.append(lo - self._widest(prefix))
+
+    @staticmethod
+    def _cell_spans(lat: float, lon: float, radius_km: float) -> List[Tuple[int, int]]:
+        """Inclusive cell-id ranges covering the bounding box of the circle, one or two per grid row."""
+        dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+        if abs(lat) + dlat >= 90.0:
+            # the circle covers a pole, so every longitude
+            dlon = 180.0
+        else:
+            dlon = min(180.0, dlat / math.cos(math.radians(abs(lat) + dlat)))
+        south, north = max(-90.0, lat - dlat), min(90.0 - 1e-9, lat + dlat)
+        first_row, last_row = grid_cell(south, 0.0) // GRID_COLS, grid_cell(north, 0.0) // GRID_COLS
+        if dlon >= 180.0:
+            return [(first_row * GRID_COLS, (last_row + 1) * GRID_COLS - 1)]
+        west_col = grid_cell(0.0, lon - dlon) % GRID_COLS
+        east_col = grid_cell(0.0, lon + dlon) % GRID_COLS
+        # a box across the antimeridian is two column spans per row
+        cols = [(west_col, east_col)] if west_col <= east_col else [(west_col, GRID_COLS - 1), (0, east_col)]
+        return [(row * GRID_COLS + c0, row * GRID_COLS + c1) for row in range(first_row, last_row + 1) for c0, c1 in cols]
+
+    def query(
+        self,
+        city: Optional[str] = None,
+        state: Optional[str] = None,
+        zip_code: Optional[str] = None,
+        rent: Optional[Bounds] = None,
+        beds: Optional[Bounds] = None,
+        near: Optional[Tuple[float, float]] = None,
+        radius_km: Optional[float] = None,
+        limit: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Listings matching every given filter. Ranges match listings whose
+        {min, max} overlaps them. With `near` and `radius_km`, results are
+        sorted nearest first and carry `_distanceKm`.
+        """
+        where: List[str] = []
+        params: List[Any] = []
+        for column, value in (("city", _norm_text(city)), ("state", _norm_text(state)), ("zip", _norm_zip(zip_code))):
+            if value is not None:
+                where.append(f"{column} = ?")
+                params.append(value)
+        if rent is not None:
+            self._range_clause("rent", rent, where, params)
+        if beds is not None:
+            self._range_clause("beds", beds, where, params)
+        if near is None or radius_km is None:
+            sql = "SELECT data FROM listings"
+            if where:
+                sql += " WHERE " + " AND ".join(where)
+            if limit is not None:
+                sql += f" LIMIT {int(limit)}"
+            return [json.loads(data) for (data,) in self.conn.execute(sql, params)]
+
+        # One indexed range scan per grid row (as a single OR, SQLite falls back
+        # to a full scan); candidates are ranked on coordinates alone and only
+        # the rows returned are read in full
+        sql = "SELECT id, lat, lon FROM listings INDEXED BY listings_cell WHERE cell BETWEEN ? AND ?"
+        sql += "".join(f" AND {w}" for w in where)
+        hits = []
+        for first, last in self._cell_spans(near[0], near[1], radius_km):
+            for rowid, lat, lon in self.conn.execute(sql, [first, last, *params]):
+                distance = haversine_km(near[0], near[1], lat, lon)
+                if distance <= radius_km:
+                    hits.append((distance, rowid))
+        hits.sort()
+        out = []
+        for distance, rowid in hits[:limit]:
+            rec = json.loads(self.conn.execute("SELECT data FROM listings WHERE id = ?", (rowid,)).fetchone()[0])
+            rec["_distanceKm"] = round(distance, 3)
+            out.append(rec)
+        return out
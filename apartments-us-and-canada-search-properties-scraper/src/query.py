@@ -0,0 +1,88 @@
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from outputs.exporters import export_stream, iter_record_file
+from outputs.listing_index import Bounds, ListingIndex
+
+def parse_bounds(text: str) -> Bounds:
+    """'1000:1500', '2:' or ':1500' -> (low, high) with None for an open side."""
+    lo, sep, hi = text.partition(":")
+    if not sep:
+        lo = hi = text
+    try:
+        return (float(lo) if lo.strip() else None, float(hi) if hi.strip() else None)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected LOW:HIGH, LOW: or :HIGH, got {text!r}") from None
+
+def parse_point(text: str) -> Tuple[float, float]:
+    try:
+        lat, lon = (float(v) for v in text.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected LAT,LON, got {text!r}") from None
+    return lat, lon
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Build and query a local index of scraped listings")
+    parser.add_argument(
+        "--index",
+        default=str(Path("data") / "listings.index.sqlite"),
+        help="Path to the index file.",
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    build = sub.add_parser("build", help="Index json/ndjson outputs (optionally .gz/.zst).")
+    build.add_argument("inputs", nargs="+", metavar="OUTPUT")
+    build.add_argument(
+        "--append",
+        action="store_true",
+        help="Add to the existing index instead of rebuilding it; incremental `removed` records delete listings.",
+    )
+
+    find = sub.add_parser("find", help="Print matching listings as ndjson, or write them to --out.")
+    find.add_argument("--city")
+    find.add_argument("--state")
+    find.add_argument("--zip", dest="zip_code")
+    find.add_argument("--rent", type=parse_bounds, metavar="LOW:HIGH", help="Monthly rent range, e.g. 1000:1500 or :2000.")
+    find.add_argument("--beds", type=parse_bounds, metavar="LOW:HIGH", help="Bedrooms, e.g. 2 or 2: (studio is 0).")
+    find.add_argument("--near", type=parse_point, metavar="LAT,LON", help="Centre of a radius search (needs --radius-km).")
+    find.add_argument("--radius-km", type=float)
+    find.add_argument("--limit", type=int)
+    find.add_argument("--out", help="Write results to this file (json, ndjson, csv, ... by extension).")
+    args = parser.parse_args(argv)
+
+    with ListingIndex(args.index) as index:
+        if args.command == "build":
+            started = time.perf_counter()
+            records = (rec for path in args.inputs for rec in iter_record_file(path))
+            n = index.add(records) if args.append else index.rebuild(records)
+            print(f"Indexed {n} listings ({index.count()} total) in {time.perf_counter() - started:.1f}s: {args.index}")
+            return
+
+        if (args.near is None) != (args.radius_km is None):
+            parser.error("--near and --radius-km go together")
+        started = time.perf_counter()
+        results = index.query(
+            city=args.city,
+            state=args.state,
+            zip_code=args.zip_code,
+            rent=args.rent,
+            beds=args.beds,
+            near=args.near,
+            radius_km=args.radius_km,
+            limit=args.limit,
+        )
+        elapsed_ms = (time.perf_counter() - started) * 1000
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        export_stream(results, args.out)
+    else:
+        for rec in results:
+            sys.stdout.write(json.dumps(rec, ensure_ascii=False) + "\n")
+    print(f"{len(results)} listings in {elapsed_ms:.1f} ms", file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
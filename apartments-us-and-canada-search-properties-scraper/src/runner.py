@@ -2,15 +2,31 @@ import argparse
 import asyncio
 import json
 import os
+import sys
+from concurrent.futures import Executor
 from pathlib import Path
-from typing import Any, Dict, List, Set
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
 
+import httpx
 import ujson as json_fast
 
-from crawler.search_collector import collect_search_results
-from crawler.details_collector import collect_listing_details
-from crawler.throttling import make_http_client
-from outputs.exporters import export_json, export_csv
+from crawler.search_collector import Pagination, iter_search_results
+from crawler.details_collector import iter_listing_details
+from crawler.frontier import Frontier, canonical_listing_url
+from crawler.http_cache import ResponseCache
+from crawler.journal import CrawlJournal
+from crawler.metrics import METRICS, SlowPageProfiler, start_prometheus_server, stats_file_reporter
+from crawler.service import CrawlService
+from crawler.sharding import parse_shard, shard_filter, shard_path
+from crawler.streaming import StreamOptions
+from crawler.snapshots import IncrementalTracker, SnapshotStore
+from crawler.parse_pool import make_parse_pool, set_profiler, warm_parse_pool
+from crawler.pipeline import iter_pipelined_details
+from crawler.proxy_pool import parse_proxy_list
+from crawler.throttling import AdaptiveLimiter, make_http_client
+from extractors.listing_parser import JSON_LD_EXTRACTORS, extractors_for, resolve_fields
+from extractors.record import as_dict
+from outputs.exporters import merge_outputs, open_record_writer
 
 def load_json(path: str) -> Any:
     with open(path, "r", encoding="utf-8") as f:
@@ -30,6 +46,216 @@ def merge_settings(defaults: Dict[str, Any], overrides: Dict[str, Any]) -> Dict[
             out[k] = v
     return out
 
+def stream_options(
+    cfg: Dict[str, Any], fields: Optional[Sequence[str]]
+) -> Tuple[Optional[StreamOptions], Optional[StreamOptions]]:
+    """(search, detail) stream options from the "stream" settings; (None, None) buffers whole bodies."""
+    stream_cfg = cfg["stream"]
+    if not stream_cfg["enabled"]:
+        return None, None
+    max_bytes = int(stream_cfg["max_kb"] * 1024)
+    # A projection served by JSON-LD alone needs nothing past </head>
+    stop_after = None
+    if stream_cfg["json_ld_in_head"] and extractors_for(fields) <= JSON_LD_EXTRACTORS:
+        stop_after = ("head",)
+    return StreamOptions(max_bytes), StreamOptions(max_bytes, stop_after)
+
+def make_pagination(cfg: Dict[str, Any], fingerprints: Optional[Mapping[str, str]]) -> Optional[Pagination]:
+    """Search pagination from the crawler settings; the stale-page stop needs the incremental snapshots."""
+    crawler_cfg = cfg["crawler"]
+    if not crawler_cfg["paginate"]:
+        return None
+    is_new = None
+    if fingerprints is not None and crawler_cfg["stop_on_stale_page"]:
+        is_new = lambda link: canonical_listing_url(link) not in fingerprints
+    return Pagination(crawler_cfg["max_search_pages"], is_new, crawler_cfg["concurrency"])
+
+async def crawl(
+    client: httpx.AsyncClient,
+    cfg: Dict[str, Any],
+    search_urls: List[str],
+    listing_urls: List[str],
+    executor: Optional[Executor] = None,
+    journal: Optional[CrawlJournal] = None,
+    fingerprints: Optional[Mapping[str, str]] = None,
+    url_filter: Optional[Callable[[str], bool]] = None,
+    fields: Optional[Sequence[str]] = None,
+    pagination: Optional[Pagination] = None,
+    sem: Optional[asyncio.Semaphore] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    crawler_cfg = cfg["crawler"]
+    if not crawler_cfg["follow_details"]:
+        return
+    search_stream, detail_stream = stream_options(cfg, fields)
+
+    # Canonicalizes and dedupes listing URLs; on resume, listings finished by an
+    # earlier run count as seen and are not fetched again
+    with Frontier(cfg["frontier"]["path"], url_filter) as frontier:
+        if journal is not None:
+            frontier.mark_seen(journal.iter_done_urls())
+        async for rec in _crawl_frontier(
+            client, cfg, search_urls, listing_urls, frontier, executor, journal, fingerprints, fields,
+            search_stream, detail_stream, pagination, sem,
+        ):
+            yield rec
+
+async def _crawl_frontier(
+    client: httpx.AsyncClient,
+    cfg: Dict[str, Any],
+    search_urls: List[str],
+    listing_urls: List[str],
+    frontier: Frontier,
+    executor: Optional[Executor],
+    journal: Optional[CrawlJournal],
+    fingerprints: Optional[Mapping[str, str]],
+    fields: Optional[Sequence[str]],
+    search_stream: Optional[StreamOptions],
+    detail_stream: Optional[StreamOptions],
+    pagination: Optional[Pagination],
+    sem: Optional[asyncio.Semaphore],
+) -> AsyncIterator[Dict[str, Any]]:
+    crawler_cfg = cfg["crawler"]
+    if crawler_cfg["pipeline"]:
+        # Search and detail fetching overlap through a bounded queue
+        async for rec in iter_pipelined_details(
+            client=client,
+            search_urls=search_urls,
+            listing_urls=listing_urls,
+            concurrency=crawler_cfg["concurrency"],
+            retry_attempts=crawler_cfg["retry_attempts"],
+            retry_backoff_base_ms=crawler_cfg["retry_backoff_base_ms"],
+            queue_size=crawler_cfg["queue_size"],
+            executor=executor,
+            on_accept=(lambda url: journal.mark_pending([url])) if journal is not None else None,
+            fingerprints=fingerprints,
+            fields=fields,
+            search_stream=search_stream,
+            detail_stream=detail_stream,
+            frontier=frontier,
+            pagination=pagination,
+            sem=sem,
+        ):
+            yield rec
+        return
+
+    # 1) Gather listing URLs
+    frontier.extend(listing_urls)
+    if search_urls:
+        async for links in iter_search_results(
+            client=client,
+            search_urls=search_urls,
+            concurrency=crawler_cfg["concurrency"],
+            retry_attempts=crawler_cfg["retry_attempts"],
+            retry_backoff_base_ms=crawler_cfg["retry_backoff_base_ms"],
+            executor=executor,
+            stream=search_stream,
+            pagination=pagination,
+            sem=sem,
+        ):
+            frontier.extend(links)
+
+    # 2) Fetch details, handing URLs to the workers batch by batch
+    def pending_urls() -> Iterator[str]:
+        for batch in frontier.iter_batches():
+            if journal is not None:
+                journal.mark_pending(batch)
+            yield from batch
+
+    async for rec in iter_listing_details(
+        client=client,
+        listing_urls=pending_urls(),
+        concurrency=crawler_cfg["concurrency"],
+        retry_attempts=crawler_cfg["retry_attempts"],
+        retry_backoff_base_ms=crawler_cfg["retry_backoff_base_ms"],
+        executor=executor,
+        fingerprints=fingerprints,
+        fields=fields,
+        stream=detail_stream,
+        sem=sem,
+    ):
+        yield rec
+
+async def serve(
+    cfg: Dict[str, Any],
+    proxies: Dict[str, Any],
+    fields: Optional[Sequence[str]],
+    cache: Optional[ResponseCache],
+    offline: bool,
+    limiter: Optional[AdaptiveLimiter],
+) -> None:
+    """
+    Daemon mode: one HTTP client (connection pool, TLS sessions, rate limits),
+    one parse pool and one `crawler.concurrency` fetch semaphore, shared by every
+    job posted to the crawl service until it is stopped. Jobs are stateless:
+    no journal, snapshots or frontier file, and the output goes back to the caller.
+    """
+    service_cfg = cfg["service"]
+    # Concurrent jobs can't share a frontier file; each keeps its own in memory
+    job_cfg = merge_settings(cfg, {"frontier": {"path": None}})
+    sem = asyncio.Semaphore(cfg["crawler"]["concurrency"])
+
+    with make_parse_pool(cfg["crawler"]["parse_workers"]) as executor:
+        await warm_parse_pool(executor, cfg["crawler"]["parse_workers"])
+        async with make_http_client(
+            headers=cfg["http"]["headers"],
+            timeout=cfg["http"]["timeout_secs"],
+            max_connections=cfg["http"]["max_connections"],
+            proxies=proxies,
+            cache=cache,
+            cache_offline=offline,
+            limiter=limiter,
+        ) as client:
+
+            def start_job(job: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+                # resolved here so an unknown field is a 400, not a failed stream
+                job_fields = resolve_fields(job["fields"]) if job.get("fields") is not None else fields
+                return job_records(job.get("searchUrls") or [], job.get("listingUrls") or [], job_fields)
+
+            async def job_records(
+                search_urls: List[str], listing_urls: List[str], job_fields: Optional[Sequence[str]]
+            ) -> AsyncIterator[Dict[str, Any]]:
+                async for rec in crawl(
+                    client, job_cfg, search_urls, listing_urls, executor, fields=job_fields,
+                    pagination=make_pagination(job_cfg, None), sem=sem,
+                ):
+                    yield as_dict(rec)
+
+            await CrawlService(start_job).serve(service_cfg["host"], service_cfg["port"], service_cfg["unix_socket"])
+
+async def run_shards(args: argparse.Namespace, count: int, fields: Optional[Sequence[str]] = None) -> None:
+    """
+    Local coordinator: runs `count` copies of this script, each crawling one
+    `--shard i/count` into its own ndjson part, then merges the parts into --out.
+    """
+    out_path = Path(args.out)
+    stem = out_path.name.split(".", 1)[0]
+    parts = [str(out_path.with_name(f"{stem}.part{i}of{count}.ndjson")) for i in range(count)]
+    flags = [f for f in ("resume", "incremental", "offline") if getattr(args, f)]
+    # children get their part path via --out, not the parent's OUTPUT_PATH
+    env = {k: v for k, v in os.environ.items() if k != "OUTPUT_PATH"}
+    procs = []
+    for i, part in enumerate(parts):
+        cmd = [
+            sys.executable,
+            os.path.abspath(__file__),
+            "--inputs", args.inputs,
+            "--settings", args.settings,
+            "--proxies", args.proxies,
+            "--out", part,
+            "--shard", f"{i}/{count}",
+        ] + [f"--{f}" for f in flags]
+        if args.fields:
+            cmd += ["--fields", args.fields]
+        procs.append(await asyncio.create_subprocess_exec(*cmd, env=env))
+    codes = await asyncio.gather(*(p.wait() for p in procs))
+    failed = [i for i, code in enumerate(codes) if code != 0]
+    if failed:
+        raise SystemExit(f"shards {failed} failed; parts kept, rerun with --resume")
+    n = merge_outputs(parts, str(out_path), fields)
+    for part in parts:
+        os.remove(part)
+    print(f"Merged {count} shards: {n} records to {out_path}")
+
 async def main() -> None:
     parser = argparse.ArgumentParser(description="Apartments.com US & Canada Scraper")
     parser.add_argument(
@@ -50,10 +276,66 @@ async def main() -> None:
     parser.add_argument(
         "--out",
         default=str(Path("data") / "output.json"),
-        help="Output file path (json or csv by extension).",
+        help="Output file path (json, ndjson or csv by extension; add .gz/.zst to compress).",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue the crawl recorded in the journal, skipping listings already done.",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Compare against the previous snapshot and only write added/changed/removed listings.",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help="Serve every page from the response cache and never touch the network.",
+    )
+    parser.add_argument(
+        "--fields",
+        help="Comma-separated output fields (e.g. monthlyRent,bedrooms,location); only their extractors run.",
+    )
+    parser.add_argument(
+        "--shard",
+        help="Only crawl listings in shard i of N (e.g. 0/4), partitioned by a stable hash of the listing URL.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="Run N shard processes locally and merge their outputs into --out.",
+    )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Run as a long-lived crawl service taking jobs over HTTP or a Unix socket (see the `service` settings).",
+    )
+    parser.add_argument(
+        "--merge",
+        nargs="+",
+        metavar="PART",
+        help="Merge existing json/ndjson shard outputs into --out (deduped by listingId) and exit.",
     )
     args = parser.parse_args()
 
+    # Allow ENV overrides
+    env_out = os.getenv("OUTPUT_PATH")
+    if env_out:
+        args.out = env_out
+
+    # Merging needs neither settings nor inputs; check --fields before reading any part
+    if args.merge:
+        try:
+            fields = resolve_fields(args.fields.split(",")) if args.fields else None
+        except ValueError as e:
+            parser.error(str(e))
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        n = merge_outputs(args.merge, args.out, fields)
+        print(f"Merged {len(args.merge)} parts: {n} records to {args.out}")
+        return
+
     settings = load_json(args.settings)
     inputs = load_json(args.inputs)
 
@@ -61,11 +343,10 @@ async def main() -> None:
         proxies = load_json(args.proxies)
     else:
         proxies = {"http": None, "https": None}
-
-    # Allow ENV overrides
-    env_out = os.getenv("OUTPUT_PATH")
-    if env_out:
-        args.out = env_out
+    try:
+        parse_proxy_list(proxies)
+    except RuntimeError as e:
+        parser.error(str(e))
 
     # Merge CLI-style overrides (none for now) and environment
     cfg = merge_settings(
@@ -85,55 +366,210 @@ async def main() -> None:
                 "retry_backoff_base_ms": 400,
                 "follow_details": True,
                 "respect_robots": False,
+                "pipeline": False,
+                "queue_size": 1000,
+                "parse_workers": 0,
+                "paginate": False,
+                "max_search_pages": 0,
+                "stop_on_stale_page": True,
+            },
+            "journal": {
+                "enabled": False,
+                "path": str(Path("data") / "crawl_journal.sqlite"),
+            },
+            "incremental": {
+                "enabled": False,
+                "path": str(Path("data") / "snapshots.sqlite"),
+            },
+            "rate_limit": {
+                "enabled": False,
+                "initial": 4,
+                "min": 1,
+                "max": 64,
+                "decrease": 0.5,
+                "latency_factor": 3.0,
+            },
+            "cache": {
+                "enabled": False,
+                "dir": str(Path("data") / ".http_cache"),
+                "max_mb": 1024,
+                "ttl_secs": 6 * 3600,
+            },
+            "fields": None,
+            "frontier": {
+                "path": None,
+            },
+            "stream": {
+                "enabled": False,
+                "max_kb": 4096,
+                "json_ld_in_head": False,
+            },
+            "service": {
+                "host": "127.0.0.1",
+                "port": 8790,
+                "unix_socket": None,
+            },
+            "metrics": {
+                "stats_file": None,
+                "interval_secs": 10,
+                "prometheus_host": "127.0.0.1",
+                "prometheus_port": None,
+                "profile_sample_rate": 0.0,
+                "profile_slow_ms": 1000,
+                "profile_dir": str(Path("data") / "profiles"),
             },
         },
         settings,
     )
 
-    async with make_http_client(
-        headers=cfg["http"]["headers"],
-        timeout=cfg["http"]["timeout_secs"],
-        max_connections=cfg["http"]["max_connections"],
-        proxies=proxies,
-    ) as client:
-        # 1) Gather listing URLs
-        input_search_urls: List[str] = inputs.get("searchUrls", []) or []
-        input_listing_urls: List[str] = inputs.get("listingUrls", []) or []
-
-        listing_urls: Set[str] = set(input_listing_urls)
-        if input_search_urls:
-            found = await collect_search_results(
-                client=client,
-                search_urls=input_search_urls,
-                concurrency=cfg["crawler"]["concurrency"],
-                retry_attempts=cfg["crawler"]["retry_attempts"],
-                retry_backoff_base_ms=cfg["crawler"]["retry_backoff_base_ms"],
-            )
-            listing_urls.update(found)
-
-        listing_urls = {u for u in listing_urls if "apartments.com" in u}
-
-        # 2) Fetch details
-        results = []
-        if cfg["crawler"]["follow_details"] and listing_urls:
-            results = await collect_listing_details(
-                client=client,
-                listing_urls=sorted(list(listing_urls)),
-                concurrency=cfg["crawler"]["concurrency"],
-                retry_attempts=cfg["crawler"]["retry_attempts"],
-                retry_backoff_base_ms=cfg["crawler"]["retry_backoff_base_ms"],
-            )
+    # Field projection: CLI wins over settings; None keeps every field
+    try:
+        fields = resolve_fields(args.fields.split(",") if args.fields else cfg["fields"])
+    except ValueError as e:
+        parser.error(str(e))
+
+    shard = None
+    if args.shard:
+        try:
+            shard = parse_shard(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+
+    if args.workers > 1 and not args.shard:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        await run_shards(args, args.workers, fields)
+        return
+
+    input_search_urls: List[str] = inputs.get("searchUrls", []) or []
+    input_listing_urls: List[str] = inputs.get("listingUrls", []) or []
 
-    # 3) Export
     out_path = Path(args.out)
     out_path.parent.mkdir(parents=True, exist_ok=True)
 
-    if out_path.suffix.lower() == ".csv":
-        export_csv(results, str(out_path))
-    else:
-        export_json(results, str(out_path))
+    # Each shard keeps its own journal and snapshots; the response cache is shared
+    url_filter = None
+    if shard is not None:
+        index, count = shard
+        url_filter = shard_filter(index, count)
+        cfg["journal"]["path"] = shard_path(cfg["journal"]["path"], index, count)
+        cfg["incremental"]["path"] = shard_path(cfg["incremental"]["path"], index, count)
+        if cfg["frontier"]["path"]:
+            cfg["frontier"]["path"] = shard_path(cfg["frontier"]["path"], index, count)
+        if cfg["metrics"]["stats_file"]:
+            cfg["metrics"]["stats_file"] = shard_path(cfg["metrics"]["stats_file"], index, count)
+        if cfg["metrics"]["prometheus_port"]:
+            cfg["metrics"]["prometheus_port"] += index
+
+    cache = None
+    if cfg["cache"]["enabled"] or args.offline:
+        cache = ResponseCache(
+            cfg["cache"]["dir"],
+            max_bytes=int(cfg["cache"]["max_mb"] * 1024 * 1024),
+            ttl_secs=cfg["cache"]["ttl_secs"],
+        )
 
-    print(f"Wrote {len(results)} records to {out_path}")
+    limiter = None
+    if cfg["rate_limit"]["enabled"]:
+        rl = cfg["rate_limit"]
+        limiter = AdaptiveLimiter(
+            initial=rl["initial"],
+            minimum=rl["min"],
+            maximum=rl["max"],
+            decrease=rl["decrease"],
+            latency_factor=rl["latency_factor"],
+        )
+
+    if args.serve:
+        await serve(cfg, proxies, fields, cache, args.offline, limiter)
+        return
+
+    # A fresh run clears the journal; --resume keeps it and replays finished records
+    journal = None
+    if cfg["journal"]["enabled"] or args.resume:
+        journal = CrawlJournal(cfg["journal"]["path"], reset=not args.resume)
+
+    # Incremental mode skips parsing unchanged HTML and emits only changes
+    tracker = None
+    fingerprints = None
+    if cfg["incremental"]["enabled"] or args.incremental:
+        tracker = IncrementalTracker(SnapshotStore(cfg["incremental"]["path"]))
+        tracker.store.begin_run(resume=args.resume)
+        fingerprints = tracker.store.html_fingerprints()
+    pagination = make_pagination(cfg, fingerprints)
+
+    # Telemetry: periodic JSON stats file and/or a Prometheus endpoint, plus
+    # cProfile dumps for a sample of slow parses
+    metrics_cfg = cfg["metrics"]
+    if metrics_cfg["profile_sample_rate"]:
+        set_profiler(
+            SlowPageProfiler(
+                metrics_cfg["profile_sample_rate"], metrics_cfg["profile_slow_ms"], metrics_cfg["profile_dir"]
+            )
+        )
+    reporter = None
+    if metrics_cfg["stats_file"]:
+        reporter = asyncio.create_task(stats_file_reporter(metrics_cfg["stats_file"], metrics_cfg["interval_secs"]))
+    prometheus = None
+    if metrics_cfg["prometheus_port"]:
+        prometheus = await start_prometheus_server(metrics_cfg["prometheus_host"], metrics_cfg["prometheus_port"])
+
+    try:
+        # Parse pool stays up for the whole crawl so workers are forked once
+        with make_parse_pool(cfg["crawler"]["parse_workers"]) as executor:
+            async with make_http_client(
+                headers=cfg["http"]["headers"],
+                timeout=cfg["http"]["timeout_secs"],
+                max_connections=cfg["http"]["max_connections"],
+                proxies=proxies,
+                cache=cache,
+                cache_offline=args.offline,
+                limiter=limiter,
+            ) as client:
+                proxy_pool = client.proxy_pool
+                # Records are written as they arrive instead of being collected first
+                with open_record_writer(str(out_path), fields) as writer:
+                    if journal is not None and args.resume:
+                        for rec in journal.iter_records():
+                            writer.write(rec)
+                    async for rec in crawl(
+                        client, cfg, input_search_urls, input_listing_urls, executor, journal, fingerprints, url_filter,
+                        fields, pagination,
+                    ):
+                        # Compact ListingRecords become output dicts here, once, for diffing/journal/export
+                        rec = as_dict(rec)
+                        out = tracker.apply(rec) if tracker is not None else rec
+                        if journal is not None:
+                            journal.record(out if out is not None else {"url": rec.get("url"), "_unchanged": True})
+                        if out is not None:
+                            writer.write(out)
+                    if tracker is not None and pagination is not None and pagination.stopped_early:
+                        # Listings on the skipped pages were not seen, which says nothing about removal
+                        print("Search stopped at a page of known listings; removed listings are not reported this run.")
+                    elif tracker is not None:
+                        for rec in tracker.removed():
+                            writer.write(rec)
+    finally:
+        if journal is not None:
+            journal.close()
+        if tracker is not None:
+            tracker.store.close()
+        if reporter is not None:
+            reporter.cancel()
+            METRICS.write_stats_file(metrics_cfg["stats_file"])
+        if prometheus is not None:
+            prometheus.close()
+
+    print(f"Wrote {writer.count} records to {out_path}")
+    print(
+        f"Pages: {METRICS.total('pages_fetched_total'):.0f} fetched, "
+        f"{METRICS.total('pages_retried_total'):.0f} retried, "
+        f"{METRICS.total('pages_failed_total'):.0f} failed, "
+        f"{METRICS.total('bytes_in_total') / 1e6:.1f} MB in"
+    )
+    if limiter is not None:
+        print(f"Rate limits: {json.dumps(limiter.snapshot())}")
+    if proxy_pool is not None:
+        print(f"Proxies: {json.dumps(proxy_pool.snapshot())}")
 
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# src/ is not a package; modules import each other as top-level names, as under runner.py
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
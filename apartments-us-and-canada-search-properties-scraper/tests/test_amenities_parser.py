@@ -0,0 +1,68 @@
+import gc
+import time
+
+import pytest
+from bs4 import BeautifulSoup
+
+from extractors.amenities_parser import parse_amenities
+
+def amenities(html: str):
+    return parse_amenities(BeautifulSoup(html, "lxml"))
+
+@pytest.mark.parametrize(
+    "html, expected",
+    [
+        (
+            "<section><h2>Apartment Amenities</h2><ul><li>Pool</li><li>Gym</li><li>Pool</li></ul></section>"
+            "<section><h2>Fees</h2><ul><li>Parking $50</li></ul></section>",
+            [{"title": "Apartment Amenities", "value": ["Gym", "Pool"]}],
+        ),
+        (
+            # nested containers under the same first heading each get an entry
+            "<section><div><h2>Amenities</h2><ul><li>A</li></ul></div><ul><li>B</li></ul></section>",
+            [{"title": "Amenities", "value": ["A", "B"]}, {"title": "Amenities", "value": ["A"]}],
+        ),
+        (
+            # only a container's first heading names it
+            "<div><h3>Community Amenities</h3><ul><li>Clubhouse</li></ul>"
+            "<h3>Unit Amenities</h3><ul><li>Dishwasher</li></ul></div>",
+            [{"title": "Community Amenities", "value": ["Clubhouse", "Dishwasher"]}],
+        ),
+        (
+            "<div><h2>Features</h2><ul><li>Balcony</li></ul></div>"
+            "<div><h2>Amenities</h2><ul><li>" + "x" * 120 + "</li><li> </li></ul></div>",
+            [],
+        ),
+        (
+            # no titled section: amenity pills
+            '<div><span class="amenity">Pet Friendly</span><span class="amenity">Elevator</span></div>',
+            [{"title": "Amenities", "value": ["Elevator", "Pet Friendly"]}],
+        ),
+    ],
+)
+def test_output(html, expected):
+    assert amenities(html) == expected
+
+def _nested_blocks(n: int) -> str:
+    # n containers nested n deep; the only heading and list are in the innermost one
+    blocks = "".join(f"<div><p>Block {i}</p>" for i in range(n))
+    return f"<section>{blocks}<h3>Amenities</h3><ul><li>Pool</li></ul>{'</div>' * n}</section>"
+
+def _best_of(soup: BeautifulSoup, runs: int = 7) -> float:
+    best = float("inf")
+    gc.disable()
+    try:
+        for _ in range(runs):
+            started = time.perf_counter()
+            parse_amenities(soup)
+            best = min(best, time.perf_counter() - started)
+    finally:
+        gc.enable()
+    return best
+
+def test_nested_blocks_take_linear_time():
+    small, large = BeautifulSoup(_nested_blocks(500), "lxml"), BeautifulSoup(_nested_blocks(1000), "lxml")
+    # the section and every div share the innermost heading
+    assert parse_amenities(large) == [{"title": "Amenities", "value": ["Pool"]}] * 1001
+    # twice the blocks should take about twice as long; searching each subtree for its heading would take 4x
+    assert _best_of(large) / _best_of(small) < 3.0
@@ -0,0 +1,53 @@
+from pathlib import Path
+
+import pytest
+from bs4 import BeautifulSoup
+
+from extractors.listing_parser import _guess_beds_baths, _page_text_light, parse_listing_page, resolve_fields
+from extractors.record import as_dict
+
+CORPUS_PAGES = sorted((Path(__file__).resolve().parent.parent / "benchmarks" / "corpus" / "listing").glob("*.html"))
+URL = "https://www.apartments.com/100-main-st-springfield-il/abc123/"
+
+NESTED_PAGES = [
+    "<div><p>Rent <b>1,450</b></p>/mo 3 <i>x</i> beds</div>",
+    "<ul><li>A<ul><li>B <em>C</em> D</li></ul>E</li>F</ul>G",
+    "<div>one<!-- note -->two<script>var x = 1;</script>three<style>p {}</style>four</div>",
+    "<section><h2>Beds</h2><span><span><span>2</span> bd</span>/</span> 1 ba<template><p>hidden</p></template> end</section>",
+    "<p>a<br>b<img src='x.png'>c<span></span>d</p>",
+]
+
+@pytest.mark.parametrize("path", CORPUS_PAGES, ids=lambda p: p.stem)
+def test_light_text_matches_soup_on_corpus(path):
+    html = path.read_text(encoding="utf-8")
+    assert _page_text_light(html) == BeautifulSoup(html, "lxml").get_text(" ", strip=True)
+
+@pytest.mark.parametrize("html", NESTED_PAGES)
+def test_light_text_matches_soup_on_nested_markup(html):
+    assert _page_text_light(html) == BeautifulSoup(html, "lxml").get_text(" ", strip=True)
+
+def test_projection_reads_the_same_rent_as_a_full_parse():
+    html = NESTED_PAGES[0]
+    projected = as_dict(parse_listing_page(URL, html, resolve_fields(["monthlyRent", "bedrooms"])))
+    full = as_dict(parse_listing_page(URL, html))
+    assert projected["_parsePath"] == "light"
+    assert projected["monthlyRent"] == full["monthlyRent"] == {"min": 1450.0, "max": 1450.0}
+
+@pytest.mark.parametrize(
+    "text, beds, baths",
+    [
+        ("$1,075 - $1,675 /mo 1 - 4 Beds 1 - 3 Baths Unit 001 1 beds 1 baths", (1.0, 4.0), (1.0, 3.0)),
+        ("Studio - 2 Beds 1 Bath", (0.0, 2.0), (1.0, 1.0)),
+        ("2 beds 1.5 baths", (2.0, 2.0), (1.5, 1.5)),
+        ("$1,500 - 2 Beds", (2.0, 2.0), (None, None)),
+        ("Bedside table, bathtub", (None, None), (None, None)),
+    ],
+)
+def test_beds_baths_ranges(text, beds, baths):
+    assert _guess_beds_baths(text) == (beds, baths)
+
+@pytest.mark.parametrize("path", CORPUS_PAGES, ids=lambda p: p.stem)
+def test_corpus_beds_baths_come_from_the_summary(path):
+    rec = as_dict(parse_listing_page(URL, path.read_text(encoding="utf-8")))
+    assert rec["bedrooms"] == {"min": 1.0, "max": 4.0}
+    assert rec["bathrooms"] == {"min": 1.0, "max": 3.0}